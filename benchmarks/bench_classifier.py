@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: HeadingClassifier against the previous per-line is_heading.
+
+Reports the classification cost per line and per word. Lines come from a PDF
+(--pdf) or are generated with a realistic share of repeated text and fonts.
+Run from the repository root:
+
+    python benchmarks/bench_classifier.py [--lines N] [--repeat N] [--pdf PATH]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_outline_extractor import (HeadingClassifier, DocumentMetrics, FontTiers, compute_font_tiers,
+                                   is_bold, _iter_page_lines, FONT_SIZE_RESOLUTION, HEADING_PATTERNS,
+                                   MAX_HEADING_CHARS, MAX_HEADING_WORDS)
+
+WORDS = ["the", "of", "analysis", "Overview", "results", "and", "Introduction", "data", "system",
+         "Appendix", "method", "for", "a", "Summary", "evaluation", "in", "model", "Background"]
+FONTS = ["ABCDEF+Times-Roman", "ABCDEF+Times-Bold", "ABCDEF+Times-Italic", "GHIJKL+Helvetica-Bold"]
+RUNNING_HEADERS = ["Annual Report 2024", "CONFIDENTIAL", "Page", "Chapter 3 Results"]
+
+
+def legacy_is_heading(text, size, fontname, tiers):
+    """is_heading as it was before HeadingClassifier (no memoization)"""
+    clean_text_val = text.strip()
+    if len(clean_text_val) < 2 or len(clean_text_val) > MAX_HEADING_CHARS:
+        return False, None
+    if not any(c.isalpha() for c in clean_text_val):
+        return False, None
+
+    word_count = len(clean_text_val.split())
+    level = tiers.level_for(size)
+    if level:
+        if (is_bold(fontname) or clean_text_val.isupper() or word_count <= MAX_HEADING_WORDS
+                or any(p.match(clean_text_val) for p in HEADING_PATTERNS)):
+            return True, level
+    elif (abs(size - tiers.body_size) <= FONT_SIZE_RESOLUTION and is_bold(fontname)
+            and word_count <= MAX_HEADING_WORDS and not clean_text_val.endswith(('.', ','))):
+        return True, "H3"
+    return False, None
+
+
+def make_lines(count, seed=0):
+    """(text, size, fontname) lines: mostly body text, some headings and
+    numbered sections, and running headers repeated on every page"""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(count):
+        if i % 40 < 2:
+            lines.append((rng.choice(RUNNING_HEADERS), 9.0, FONTS[0]))
+        elif rng.random() < 0.08:
+            words = " ".join(rng.choice(WORDS).capitalize() for _ in range(rng.randint(1, 5)))
+            number = f"{rng.randint(1, 9)}.{rng.randint(1, 9)} " if rng.random() < 0.5 else ""
+            lines.append((number + words, rng.choice([14.0, 16.0, 20.0, 11.0]), rng.choice(FONTS)))
+        else:
+            words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 16)))
+            lines.append((words + rng.choice([".", ",", ""]), 11.0, rng.choice(FONTS[:1] * 6 + FONTS)))
+    return lines
+
+
+def pdf_lines(path):
+    metrics = DocumentMetrics(os.path.basename(path))
+    return [(text, size, font) for _, lines in _iter_page_lines(path, 1, 0, False, metrics)
+            for text, size, font, *_ in lines]
+
+
+def run(func, lines, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text, size, font in lines:
+            func(text, size, font)
+    return (time.perf_counter() - start) / (len(lines) * repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=20000, help="generated lines (ignored with --pdf)")
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the lines")
+    parser.add_argument("--pdf", help="classify the lines of this PDF instead of generated ones")
+    args = parser.parse_args()
+
+    if args.pdf:
+        lines = pdf_lines(args.pdf)
+        tiers = compute_font_tiers([size for _, size, _ in lines], [len(text) for text, _, _ in lines])
+    else:
+        lines = make_lines(args.lines)
+        tiers = FontTiers(11.0, [20.0, 16.0, 14.0])
+    words = sum(len(text.split()) for text, _, _ in lines)
+
+    classifier = HeadingClassifier(tiers)
+    mismatches = sum(1 for text, size, font in lines
+                     if classifier.classify(text, size, font) != legacy_is_heading(text, size, font, tiers))
+
+    # One pass on a fresh classifier is what a single document pays
+    results = [
+        ("legacy is_heading", run(lambda t, s, f: legacy_is_heading(t, s, f, tiers), lines, args.repeat)),
+        ("classifier, cold", run(HeadingClassifier(tiers).classify, lines, 1)),
+        ("classifier, warm", run(classifier.classify, lines, args.repeat)),
+    ]
+
+    baseline = results[0][1]
+    print(f"{len(lines)} lines ({words} words, {len(set(lines))} distinct), {args.repeat} passes, {tiers}")
+    for name, per_line in results:
+        per_word = per_line * len(lines) / words if words else 0.0
+        print(f"  {name:<20} {per_line * 1e9:>8.0f} ns/line  {per_word * 1e9:>8.0f} ns/word  "
+              f"({baseline / per_line:5.1f}x)")
+    print(f"  output mismatches vs legacy: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: clean_text against the previous one-re.sub-per-fix version.
+
+Also lists the real compound words (compound_words.txt) that word
+segmentation splits, which should be none or close to it. Run from the
+repository root:
+
+    python benchmarks/bench_clean_text.py [--strings N] [--repeat N]
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_outline_extractor import clean_text, segment_word, WORD_FIXES
+
+COMPOUND_WORDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "compound_words.txt")
+FILLER_WORDS = ["Overview", "the", "Document", "section", "analysis", "Round1A", "and",
+                "Results", "of", "Introduction", "data", "Appendix", "Summary"]
+
+
+def legacy_clean_text(text):
+    """clean_text as it was before the single-pass engine (one re.sub per fix)"""
+    if not text:
+        return ""
+    
+    # Remove extra whitespace
+    text = re.sub(r'\s+', ' ', text.strip())
+    
+    # Fix common word separation issues
+    # Add spaces before capital letters that are likely word boundaries
+    text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text)
+    
+    # Fix specific patterns like "Connectthedots" -> "Connect the dots"
+    text = re.sub(r'([a-z])([A-Z][a-z]+)', r'\1 \2', text)
+    
+    # Fix specific merged words from the PDF
+    text = re.sub(r'Connectthe', 'Connect the', text)
+    text = re.sub(r'Welcometo', 'Welcome to', text)
+    text = re.sub(r'Connectingthe', 'Connecting the', text)
+    text = re.sub(r'Areyouin', 'Are you in', text)
+    text = re.sub(r'andconnect', 'and connect', text)
+    text = re.sub(r'Inaworld', 'In a world', text)
+    text = re.sub(r'floodedwith', 'flooded with', text)
+    text = re.sub(r'Buildabeautiful', 'Build a beautiful', text)
+    text = re.sub(r'Youmustbuild', 'You must build', text)
+    text = re.sub(r'asolutionthat', 'a solution that', text)
+    text = re.sub(r'Bybuildingan', 'By building an', text)
+    text = re.sub(r'outlineextractor', 'outline extractor', text)
+    text = re.sub(r'Thisoutlinewill', 'This outline will', text)
+    text = re.sub(r'bethefoundation', 'be the foundation', text)
+    text = re.sub(r'fortherestof', 'for the rest of', text)
+    text = re.sub(r'yourhackathon', 'your hackathon', text)
+    text = re.sub(r'Yourjobisto', 'Your job is to', text)
+    text = re.sub(r'extractastructured', 'extract a structured', text)
+    text = re.sub(r'ThroughDocs', 'Through Docs', text)
+    text = re.sub(r'Yourcontainershould', 'Your container should', text)
+    text = re.sub(r'Afterbuildingthe', 'After building the', text)
+    text = re.sub(r'Wewillbuildthe', 'We will build the', text)
+    text = re.sub(r'dockerimageusing', 'docker image using', text)
+    text = re.sub(r'thefollowingcommand', 'the following command', text)
+    text = re.sub(r'CPUarchitecture', 'CPU architecture', text)
+    text = re.sub(r'Dockerfileto', 'Dockerfile to', text)
+    text = re.sub(r'explicitlyspecify', 'explicitly specify', text)
+    text = re.sub(r'Anymodelsor', 'Any models or', text)
+    text = re.sub(r'librariesused', 'libraries used', text)
+    text = re.sub(r'Yourapproach', 'Your approach', text)
+    text = re.sub(r'Alldependencies', 'All dependencies', text)
+    text = re.sub(r'installedwithin', 'installed within', text)
+    text = re.sub(r'thecontainer', 'the container', text)
+    text = re.sub(r'Total45', 'Total 45', text)
+    text = re.sub(r'MultilingualHandling', 'Multilingual Handling', text)
+    text = re.sub(r'Nointernetaccess', 'No internet access', text)
+    text = re.sub(r'allowedduring', 'allowed during', text)
+    text = re.sub(r'Sectiontitle', 'Section title', text)
+    text = re.sub(r'Pagenumber', 'Page number', text)
+    text = re.sub(r'Processingtimestamp', 'Processing timestamp', text)
+    text = re.sub(r'Jobtobedone', 'Job to be done', text)
+    text = re.sub(r'Inputdocuments', 'Input documents', text)
+    text = re.sub(r'Theoutputshould', 'The output should', text)
+    text = re.sub(r'TestCase', 'Test Case', text)
+    text = re.sub(r'Qualityof', 'Quality of', text)
+    text = re.sub(r'granularsubsection', 'granular subsection', text)
+    text = re.sub(r'Howwell', 'How well', text)
+    text = re.sub(r'selectedsections', 'selected sections', text)
+    text = re.sub(r'Dockerfileand', 'Dockerfile and', text)
+    text = re.sub(r'executioninstructions', 'execution instructions', text)
+    text = re.sub(r'Summarizethe', 'Summarize the', text)
+    text = re.sub(r'financialsof', 'financials of', text)
+    text = re.sub(r'corporationxyz', 'corporation xyz', text)
+    text = re.sub(r'Providea', 'Provide a', text)
+    text = re.sub(r'literaturereview', 'literature review', text)
+    text = re.sub(r'foragiven', 'for a given', text)
+    text = re.sub(r'topicand', 'topic and', text)
+    text = re.sub(r'availableresearch', 'available research', text)
+    text = re.sub(r'Researchpapers', 'Research papers', text)
+    text = re.sub(r'Documentcollection', 'Document collection', text)
+    text = re.sub(r'Concretetask', 'Concrete task', text)
+    text = re.sub(r'thepersona', 'the persona', text)
+    text = re.sub(r'needsto', 'needs to', text)
+    text = re.sub(r'Youwillbuild', 'You will build', text)
+    text = re.sub(r'asystemthat', 'a system that', text)
+    text = re.sub(r'actsasan', 'acts as an', text)
+    text = re.sub(r'intelligentdocument', 'intelligent document', text)
+    text = re.sub(r'ChallengeBrief', 'Challenge Brief', text)
+    text = re.sub(r'ConnectWhat', 'Connect What', text)
+    text = re.sub(r'Forthe', 'For the', text)
+    text = re.sub(r'UserWho', 'User Who', text)
+    text = re.sub(r'WhatYou', 'What You', text)
+    text = re.sub(r'Needto', 'Need to', text)
+    text = re.sub(r'WhatNotto', 'What Not to', text)
+    text = re.sub(r'ForSample', 'For Sample', text)
+    text = re.sub(r'Inputand', 'Input and', text)
+    text = re.sub(r'OutputFiles', 'Output Files', text)
+    text = re.sub(r'pleaserefer', 'please refer', text)
+    text = re.sub(r'totheappendix', 'to the appendix', text)
+    text = re.sub(r'SubmissionChecklist', 'Submission Checklist', text)
+    text = re.sub(r'ScoringCriteria', 'Scoring Criteria', text)
+    text = re.sub(r'CriteriaPoints', 'Criteria Points', text)
+    text = re.sub(r'RequiredOutput', 'Required Output', text)
+    text = re.sub(r'AcademicResearch', 'Academic Research', text)
+    text = re.sub(r'SampleTest', 'Sample Test', text)
+    text = re.sub(r'BusinessAnalysis', 'Business Analysis', text)
+    text = re.sub(r'EducationalContent', 'Educational Content', text)
+    text = re.sub(r'DocumentCollection', 'Document Collection', text)
+    text = re.sub(r'InputSpecification', 'Input Specification', text)
+    
+    # Clean up multiple spaces
+    text = re.sub(r'\s+', ' ', text)
+    
+    return text.strip()
+
+
+def make_inputs(count, seed=0):
+    """Heading-like strings mixing merged words from the fix table with filler"""
+    rng = random.Random(seed)
+    merged = list(WORD_FIXES)
+    inputs = []
+    for _ in range(count):
+        parts = [rng.choice(merged if rng.random() < 0.4 else FILLER_WORDS)
+                 for _ in range(rng.randint(1, 6))]
+        inputs.append(("" if rng.random() < 0.5 else " ").join(parts))
+    return inputs
+
+
+def load_compound_words(path=COMPOUND_WORDS_PATH):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def run(func, inputs, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in inputs:
+            func(text)
+    elapsed = time.perf_counter() - start
+    return len(inputs) * repeat / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--strings", type=int, default=5000, help="distinct input strings")
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the inputs")
+    args = parser.parse_args()
+
+    inputs = make_inputs(args.strings)
+    mismatches = sum(1 for text in inputs if clean_text(text) != legacy_clean_text(text))
+
+    uncached = clean_text.__wrapped__
+    results = [
+        ("legacy (re.sub per fix)", run(legacy_clean_text, inputs, args.repeat)),
+        ("single pass, uncached", run(uncached, inputs, args.repeat)),
+    ]
+    clean_text.cache_clear()
+    results.append(("single pass, memoized", run(clean_text, inputs, args.repeat)))
+
+    # Optional word segmentation stage: cold per-token cache, then warm
+    segment_word.cache_clear()
+    results.append(("+ segmentation, uncached", run(lambda t: uncached(t, True), inputs, 1)))
+    results.append(("+ segmentation, memoized", run(lambda t: clean_text(t, True), inputs, args.repeat)))
+
+    baseline = results[0][1]
+    print(f"{len(inputs)} strings x {args.repeat} passes, {len(WORD_FIXES)} fixes")
+    for name, rate in results:
+        print(f"  {name:<26} {rate:>12,.0f} strings/s  ({rate / baseline:5.1f}x)")
+    print(f"  output mismatches vs legacy: {mismatches}")
+
+    compounds = load_compound_words()
+    split = [f"{word} -> {segment_word(word)}" for word in compounds if segment_word(word) != word]
+    print(f"  compound words split by segmentation: {len(split)} of {len(compounds)}"
+          + "".join(f"\n    {line}" for line in split))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Generate synthetic PDFs with a known heading tree, for benchmarking the extractor.
+
+Each document is written as <name>.pdf next to <name>.truth.json, which holds
+the ground-truth {"title", "outline"} in the same shape the extractor writes.
+Everything is produced offline with a minimal PDF writer using the standard
+14 fonts, so no extra packages are needed.
+
+Run from the repository root:
+
+    python benchmarks/generate_corpus.py --out /tmp/corpus --docs 20 --pages 30
+"""
+
+import os
+import json
+import random
+import argparse
+
+from pdfminer.fontmetrics import FONT_METRICS
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+MARGIN = 72
+COLUMN_GAP = 24
+
+FONT_FAMILIES = {
+    "helvetica": ("Helvetica", "Helvetica-Bold"),
+    "times": ("Times-Roman", "Times-Bold"),
+    "courier": ("Courier", "Courier-Bold"),
+}
+LAYOUTS = ("single", "two-column")
+
+# (font size, bold) for each block kind
+STYLES = {
+    "H1": (20, True),
+    "H2": (15, True),
+    "H3": (12.5, True),
+    "body": (10.5, False),
+}
+# Documents with a fourth heading size, below H3: the extractor maps every
+# heading size past the second to H3, so H4 headings are expected as H3
+DEEP_STYLES = {
+    "H1": (24, True),
+    "H2": (18, True),
+    "H3": (14, True),
+    "H4": (12.5, True),
+    "body": (10.5, False),
+}
+
+VOCABULARY = (
+    "system data model analysis process design method result value network document structure "
+    "report section user service policy market energy health history language research project "
+    "quality security storage index layout format review study growth planning budget practice "
+    "performance feature pipeline archive protocol framework strategy summary evidence approach "
+    "measure signal context output input cluster resource support domain region survey estimate"
+).split()
+FILLER = "the of and to in for with on by from as at that this are is was be".split()
+
+
+def text_width(text, font, size):
+    widths = FONT_METRICS[font][1]
+    return sum(widths.get(c, 500) for c in text) * size / 1000
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _title(rng, words):
+    return " ".join(rng.choice(VOCABULARY).capitalize() for _ in range(words))
+
+
+def _sentence_words(rng, count):
+    return [rng.choice(VOCABULARY) if rng.random() < 0.6 else rng.choice(FILLER) for _ in range(count)]
+
+
+def make_blocks(rng, numbered, deep=False):
+    """Endless stream of (kind, text) blocks: a heading tree with paragraphs,
+    with H4 headings under H3 if `deep`"""
+    counters = [0, 0, 0, 0]
+    while True:
+        counters[0] += 1
+        counters[1] = counters[2] = 0
+        yield "H1", _heading(rng, "H1", counters, numbered)
+        yield "body", " ".join(_sentence_words(rng, rng.randint(30, 80)))
+        for _ in range(rng.randint(2, 4)):
+            counters[1] += 1
+            counters[2] = 0
+            yield "H2", _heading(rng, "H2", counters, numbered)
+            yield "body", " ".join(_sentence_words(rng, rng.randint(40, 120)))
+            for _ in range(rng.randint(0, 3)):
+                counters[2] += 1
+                counters[3] = 0
+                yield "H3", _heading(rng, "H3", counters, numbered)
+                yield "body", " ".join(_sentence_words(rng, rng.randint(40, 160)))
+                for _ in range(rng.randint(0, 2) if deep else 0):
+                    counters[3] += 1
+                    yield "H4", _heading(rng, "H4", counters, numbered)
+                    yield "body", " ".join(_sentence_words(rng, rng.randint(40, 120)))
+
+
+def _heading(rng, level, counters, numbered):
+    text = _title(rng, {"H1": rng.randint(2, 5), "H2": rng.randint(2, 4), "H3": rng.randint(1, 4),
+                       "H4": rng.randint(1, 3)}[level])
+    if numbered:
+        depth = int(level[1])
+        text = ".".join(str(n) for n in counters[:depth]) + " " + text
+    return text
+
+
+def _wrap(text, font, size, width):
+    lines, line = [], ""
+    for word in text.split():
+        candidate = f"{line} {word}" if line else word
+        if line and text_width(candidate, font, size) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    if line:
+        lines.append(line)
+    return lines
+
+
+def _show_text(text, font_key, font, size, x, y, char_by_char):
+    """Content stream operators drawing one line of text"""
+    if not char_by_char:
+        return f"BT /{font_key} {size} Tf 1 0 0 1 {x:.2f} {y:.2f} Tm ({_escape(text)}) Tj ET\n"
+    # Char-by-char encoding: every glyph positioned with its own text matrix
+    ops = [f"BT /{font_key} {size} Tf\n"]
+    for char in text:
+        if char != " ":
+            ops.append(f"1 0 0 1 {x:.2f} {y:.2f} Tm ({_escape(char)}) Tj\n")
+        x += text_width(char, font, size)
+    ops.append("ET\n")
+    return "".join(ops)
+
+
+def layout_document(pages, seed=0, font_family="helvetica", layout="single",
+                    char_by_char=False, numbered=True, deep=False):
+    """Lay out `pages` pages of content.
+
+    Returns (page_streams, outline) where page_streams are content streams and
+    outline is the ground-truth list of {"level", "text", "page", "top"}.
+    """
+    rng = random.Random(seed)
+    regular, bold = FONT_FAMILIES[font_family]
+    columns = 2 if layout == "two-column" else 1
+    column_width = (PAGE_WIDTH - 2 * MARGIN - (columns - 1) * COLUMN_GAP) / columns
+
+    streams, outline = [], []
+    stream, column, y = [], 0, PAGE_HEIGHT - MARGIN
+    styles = DEEP_STYLES if deep else STYLES
+    blocks = make_blocks(rng, numbered, deep)
+
+    def next_column():
+        nonlocal stream, column, y
+        column += 1
+        y = PAGE_HEIGHT - MARGIN
+        if column == columns:
+            streams.append("".join(stream))
+            stream, column = [], 0
+
+    while len(streams) < pages:
+        kind, text = next(blocks)
+        size, is_bold = styles[kind]
+        font = bold if is_bold else regular
+        font_key = "F2" if is_bold else "F1"
+        leading = size * 1.3
+        lines = _wrap(text, font, size, column_width)
+
+        if kind != "body":
+            # Keep a heading together with at least two lines of what follows
+            if y - leading * len(lines) - 3 * styles["body"][0] < MARGIN:
+                next_column()
+                if len(streams) >= pages:
+                    break
+            y -= size * 0.6
+            outline.append({"level": kind, "text": " ".join(lines), "page": len(streams) + 1,
+                            "top": PAGE_HEIGHT - y})
+
+        x = MARGIN + column * (column_width + COLUMN_GAP)
+        for line in lines:
+            if y - leading < MARGIN:
+                next_column()
+                if len(streams) >= pages:
+                    break
+                x = MARGIN + column * (column_width + COLUMN_GAP)
+            y -= leading
+            stream.append(_show_text(line, font_key, font, size, x, y, char_by_char))
+        y -= leading * 0.5
+
+    return streams, outline
+
+
+def layout_toc(outline, font_family="helvetica", char_by_char=False):
+    """Lay out a printed table of contents for `outline`: one line per heading,
+    indented by level, with dotted leaders up to the page number.
+
+    Printed page numbers count from the first content page, which comes after
+    the TOC pages. Returns the TOC page streams.
+    """
+    regular = FONT_FAMILIES[font_family][0]
+    size = STYLES["body"][0]
+    leading = size * 1.4
+    per_page = int((PAGE_HEIGHT - 2 * MARGIN) / leading) - 2
+    dot_width = text_width(". ", regular, size)
+    streams = []
+    for start in range(0, len(outline), per_page):
+        stream = []
+        y = PAGE_HEIGHT - MARGIN
+        if not start:
+            y -= leading
+            stream.append(_show_text("Contents", "F1", regular, size, MARGIN, y, char_by_char))
+            y -= leading
+        for entry in outline[start:start + per_page]:
+            y -= leading
+            x = MARGIN + 18 * (int(entry["level"][1]) - 1)
+            number = str(entry["page"])
+            right = PAGE_WIDTH - MARGIN - text_width(number, regular, size)
+            gap = right - x - text_width(entry["text"] + " ", regular, size)
+            leader = ". " * max(3, int(gap / dot_width) - 1)
+            stream.append(_show_text(f"{entry['text']} {leader}", "F1", regular, size, x, y, char_by_char))
+            stream.append(_show_text(number, "F1", regular, size, right, y, char_by_char))
+        streams.append("".join(stream))
+    return streams
+
+
+def write_pdf(path, page_streams, fonts, outline=None):
+    """Write a minimal PDF: standard Type1 fonts, one content stream per page,
+    and optionally a bookmark tree built from `outline`"""
+    objects = {}
+    n_fonts = len(fonts)
+    catalog, pages_id = 1, 2
+    font_ids = list(range(3, 3 + n_fonts))
+    next_id = 3 + n_fonts
+    page_ids, content_ids = [], []
+    for _ in page_streams:
+        page_ids.append(next_id)
+        content_ids.append(next_id + 1)
+        next_id += 2
+
+    font_resources = " ".join(f"/F{i + 1} {font_ids[i]} 0 R" for i in range(n_fonts))
+    for i, font in enumerate(fonts):
+        objects[font_ids[i]] = (f"<< /Type /Font /Subtype /Type1 /BaseFont /{font} "
+                                f"/Encoding /WinAnsiEncoding >>")
+    for page_id, content_id, stream in zip(page_ids, content_ids, page_streams):
+        objects[page_id] = (f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                            f"/Resources << /Font << {font_resources} >> >> /Contents {content_id} 0 R >>")
+        data = stream.encode("latin-1")
+        objects[content_id] = f"<< /Length {len(data)} >>\nstream\n".encode("latin-1") + data + b"\nendstream"
+    objects[pages_id] = (f"<< /Type /Pages /Kids [{' '.join(f'{p} 0 R' for p in page_ids)}] "
+                         f"/Count {len(page_ids)} >>")
+
+    catalog_extra = ""
+    if outline:
+        outlines_id = next_id
+        next_id = _add_bookmarks(objects, outlines_id, outline, page_ids)
+        catalog_extra = f" /Outlines {outlines_id} 0 R /PageMode /UseOutlines"
+    objects[catalog] = f"<< /Type /Catalog /Pages {pages_id} 0 R{catalog_extra} >>"
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = {}
+        for obj_id in sorted(objects):
+            offsets[obj_id] = f.tell()
+            body = objects[obj_id]
+            if isinstance(body, str):
+                body = body.encode("latin-1")
+            f.write(f"{obj_id} 0 obj\n".encode("latin-1") + body + b"\nendobj\n")
+        xref = f.tell()
+        size = max(objects) + 1
+        f.write(f"xref\n0 {size}\n0000000000 65535 f \n".encode("latin-1"))
+        for obj_id in range(1, size):
+            f.write(f"{offsets[obj_id]:010d} 00000 n \n".encode("latin-1"))
+        f.write(f"trailer\n<< /Size {size} /Root {catalog} 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1"))
+
+
+def _add_bookmarks(objects, outlines_id, outline, page_ids):
+    """Add an /Outlines tree mirroring the H1 > H2 > H3 nesting; returns the next free object id"""
+    next_id = outlines_id + 1
+    root = {"id": outlines_id, "children": [], "parent": None}
+    stack = [root]
+    for entry in outline:
+        depth = int(entry["level"][1])
+        while len(stack) > depth:
+            stack.pop()
+        parent = stack[-1]
+        node = {"id": next_id, "entry": entry, "children": [], "parent": parent}
+        next_id += 1
+        parent["children"].append(node)
+        stack.append(node)
+
+    def emit(node):
+        kids = node["children"]
+        for i, kid in enumerate(kids):
+            entry = kid["entry"]
+            fields = [f"/Title ({_escape(entry['text'])})", f"/Parent {node['id']} 0 R",
+                      f"/Dest [{page_ids[entry['page'] - 1]} 0 R /XYZ 0 {PAGE_HEIGHT - entry['top']:.2f} 0]"]
+            if i > 0:
+                fields.append(f"/Prev {kids[i - 1]['id']} 0 R")
+            if i < len(kids) - 1:
+                fields.append(f"/Next {kids[i + 1]['id']} 0 R")
+            if kid["children"]:
+                fields.append(f"/First {kid['children'][0]['id']} 0 R /Last {kid['children'][-1]['id']} 0 R "
+                              f"/Count {len(kid['children'])}")
+            objects[kid["id"]] = "<< " + " ".join(fields) + " >>"
+            emit(kid)
+
+    emit(root)
+    first_last = ""
+    if root["children"]:
+        first_last = f" /First {root['children'][0]['id']} 0 R /Last {root['children'][-1]['id']} 0 R"
+    objects[outlines_id] = f"<< /Type /Outlines{first_last} /Count {len(root['children'])} >>"
+    return next_id
+
+
+def generate_document(path, pages=10, seed=0, font_family="helvetica", layout="single",
+                      char_by_char=False, numbered=True, bookmarks=False, toc=False, deep=False):
+    """Write one synthetic PDF to `path` and its ground truth next to it.
+
+    With toc=True the content is preceded by printed table-of-contents pages,
+    and outline page numbers in the ground truth count those pages too. With
+    deep=True there is a fourth heading size, recorded as H3 in the ground
+    truth.
+    Returns the ground-truth {"title", "outline"}.
+    """
+    streams, outline = layout_document(pages, seed=seed, font_family=font_family, layout=layout,
+                                       char_by_char=char_by_char, numbered=numbered, deep=deep)
+    if toc:
+        toc_streams = layout_toc(outline, font_family, char_by_char)
+        streams = toc_streams + streams
+        for entry in outline:
+            entry["page"] += len(toc_streams)
+    write_pdf(path, streams, FONT_FAMILIES[font_family], outline if bookmarks else None)
+    truth = {
+        "title": outline[0]["text"] if outline else "",
+        "outline": [{"level": min(e["level"], "H3"), "text": e["text"], "page": e["page"]} for e in outline],
+        "config": {"pages": pages, "seed": seed, "font_family": font_family, "layout": layout,
+                   "char_by_char": char_by_char, "numbered": numbered, "bookmarks": bookmarks, "toc": toc,
+                   "deep": deep},
+    }
+    with open(os.path.splitext(path)[0] + ".truth.json", "w", encoding="utf-8") as f:
+        json.dump(truth, f, indent=2)
+    return truth
+
+
+def generate_corpus(out_dir, docs=10, pages=10, seed=0, font_families=None, layouts=None,
+                    char_by_char_ratio=0.25, bookmark_ratio=0.0, toc_ratio=0.0, deep_ratio=0.2):
+    """Generate `docs` documents cycling through the given fonts and layouts.
+
+    Returns the list of generated PDF paths.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    font_families = font_families or list(FONT_FAMILIES)
+    layouts = layouts or list(LAYOUTS)
+    paths = []
+    for i in range(docs):
+        family = font_families[i % len(font_families)]
+        layout = layouts[(i // len(font_families)) % len(layouts)]
+        char_by_char = rng.random() < char_by_char_ratio
+        bookmarks = rng.random() < bookmark_ratio
+        numbered = rng.random() < 0.5
+        toc = toc_ratio > 0 and rng.random() < toc_ratio
+        deep = deep_ratio > 0 and rng.random() < deep_ratio
+        name = (f"doc{i:04d}_{family}_{layout}{'_cbc' if char_by_char else ''}{'_bm' if bookmarks else ''}"
+                f"{'_toc' if toc else ''}{'_deep' if deep else ''}.pdf")
+        path = os.path.join(out_dir, name)
+        generate_document(path, pages=pages, seed=seed * 100003 + i, font_family=family, layout=layout,
+                          char_by_char=char_by_char, numbered=numbered, bookmarks=bookmarks, toc=toc, deep=deep)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--out", required=True, help="output directory")
+    parser.add_argument("--docs", type=int, default=10, help="number of documents (default: %(default)s)")
+    parser.add_argument("--pages", type=int, default=10, help="pages per document (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default: %(default)s)")
+    parser.add_argument("--fonts", nargs="+", choices=FONT_FAMILIES, help="font families to cycle through")
+    parser.add_argument("--layouts", nargs="+", choices=LAYOUTS, help="layouts to cycle through")
+    parser.add_argument("--char-by-char", type=float, default=0.25,
+                        help="fraction of documents with per-glyph positioned text (default: %(default)s)")
+    parser.add_argument("--bookmarks", type=float, default=0.0,
+                        help="fraction of documents with an embedded bookmark tree (default: %(default)s)")
+    parser.add_argument("--toc", type=float, default=0.0,
+                        help="fraction of documents with a printed table of contents (default: %(default)s)")
+    parser.add_argument("--deep-headings", type=float, default=0.2,
+                        help="fraction of documents with a fourth heading size (default: %(default)s)")
+    args = parser.parse_args()
+
+    paths = generate_corpus(args.out, docs=args.docs, pages=args.pages, seed=args.seed,
+                            font_families=args.fonts, layouts=args.layouts,
+                            char_by_char_ratio=args.char_by_char, bookmark_ratio=args.bookmarks,
+                            toc_ratio=args.toc, deep_ratio=args.deep_headings)
+    print(f"Generated {len(paths)} PDF(s) in {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Benchmark the outline extractor on a synthetic corpus with known headings.
+
+Reports throughput (pages/s, docs/s), peak RSS, bytes read, per-stage timings and heading
+precision/recall against the ground truth, and writes everything as JSON so
+results can be compared between versions.
+
+Run from the repository root:
+
+    python benchmarks/run_benchmarks.py --docs 20 --pages 30 --output bench.json
+    python benchmarks/run_benchmarks.py --corpus /tmp/corpus --output bench.json
+"""
+
+import os
+import re
+import sys
+import json
+import glob
+import time
+import platform
+import argparse
+import tempfile
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pdf_outline_extractor as extractor
+from generate_corpus import generate_corpus
+
+def normalize(text):
+    return re.sub(r"\W+", " ", text).strip().lower()
+
+
+def score(predicted, truth):
+    """Precision/recall of predicted headings against the ground truth.
+
+    `exact` requires text and level to match, `text` ignores the level.
+    Matching is by multiset, so duplicate headings count once each.
+    """
+    scores = {}
+    for name, key in (("exact", lambda e: (normalize(e["text"]), e["level"])),
+                      ("text", lambda e: normalize(e["text"]))):
+        p, t = Counter(map(key, predicted)), Counter(map(key, truth))
+        matched = sum((p & t).values())
+        precision = matched / sum(p.values()) if p else 0.0
+        recall = matched / sum(t.values()) if t else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        scores[name] = {"matched": matched, "predicted": sum(p.values()), "truth": sum(t.values()),
+                        "precision": round(precision, 4), "recall": round(recall, 4), "f1": round(f1, 4)}
+    return scores
+
+
+def _sum_scores(rows):
+    totals = {}
+    for name in ("exact", "text"):
+        matched = sum(r["accuracy"][name]["matched"] for r in rows)
+        predicted = sum(r["accuracy"][name]["predicted"] for r in rows)
+        truth = sum(r["accuracy"][name]["truth"] for r in rows)
+        precision = matched / predicted if predicted else 0.0
+        recall = matched / truth if truth else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        totals[name] = {"precision": round(precision, 4), "recall": round(recall, 4), "f1": round(f1, 4)}
+    return totals
+
+
+def run_document(path, extract_options):
+    truth_path = os.path.splitext(path)[0] + ".truth.json"
+    with open(truth_path, encoding="utf-8") as f:
+        truth = json.load(f)
+    metrics = extractor.DocumentMetrics(os.path.basename(path))
+    headings = extractor.extract_headings_from_pdf(path, metrics=metrics, **extract_options)
+    row = metrics.as_dict()
+    row["pages"] = truth["config"]["pages"]
+    row["accuracy"] = score(headings, truth["outline"])
+    return row
+
+
+def run(paths, extract_options, repeat=1):
+    rows = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        rows = [run_document(path, extract_options) for path in paths]
+    elapsed = (time.perf_counter() - start) / repeat
+    pages = sum(row["pages"] for row in rows)
+
+    # Stage totals from the extractor's own per-document metrics (last pass)
+    stages = defaultdict(lambda: {"calls": 0, "seconds": 0.0})
+    for row in rows:
+        for name, stage in row["stages"].items():
+            stages[name]["calls"] += stage["calls"]
+            stages[name]["seconds"] += stage["seconds"]
+
+    return {
+        "extractor_version": extractor.EXTRACTOR_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": extract_options,
+        "throughput": {
+            "documents": len(rows),
+            "pages": pages,
+            "seconds": round(elapsed, 4),
+            "docs_per_sec": round(len(rows) / elapsed, 3) if elapsed else None,
+            "pages_per_sec": round(pages / elapsed, 3) if elapsed else None,
+        },
+        "peak_rss_mb": max((row["peak_rss_mb"] for row in rows), default=0),
+        "io": {
+            "bytes_read": sum(row["io_bytes"] for row in rows),
+            "file_bytes": sum(row.get("file_bytes", 0) for row in rows),
+        },
+        "stages": {name: {"calls": s["calls"], "seconds": round(s["seconds"], 4)}
+                   for name, s in sorted(stages.items(), key=lambda item: -item[1]["seconds"])},
+        "accuracy": _sum_scores(rows),
+        "documents": rows,
+    }
+
+
+def print_summary(results):
+    t = results["throughput"]
+    print(f"{t['documents']} documents, {t['pages']} pages in {t['seconds']:.2f}s: "
+          f"{t['docs_per_sec']} docs/s, {t['pages_per_sec']} pages/s, peak RSS {results['peak_rss_mb']} MB")
+    io_stats = results["io"]
+    if io_stats["file_bytes"]:
+        print(f"Read {io_stats['bytes_read']:,} of {io_stats['file_bytes']:,} bytes "
+              f"({io_stats['bytes_read'] / io_stats['file_bytes']:.1%})")
+    print("Stages:")
+    for name, s in results["stages"].items():
+        print(f"  {name:<20} {s['seconds']:>8.3f}s  {s['calls']:>8} calls")
+    for name, a in results["accuracy"].items():
+        print(f"Accuracy ({name}): precision {a['precision']:.3f}, recall {a['recall']:.3f}, f1 {a['f1']:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", help="directory of PDFs with .truth.json files (default: generate one)")
+    parser.add_argument("--docs", type=int, default=10, help="documents to generate (default: %(default)s)")
+    parser.add_argument("--pages", type=int, default=10, help="pages per generated document (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0, help="corpus random seed (default: %(default)s)")
+    parser.add_argument("--char-by-char", type=float, default=0.25,
+                        help="fraction of generated documents with per-glyph text (default: %(default)s)")
+    parser.add_argument("--bookmarks", type=float, default=0.0,
+                        help="fraction of generated documents with bookmarks (default: %(default)s)")
+    parser.add_argument("--toc", type=float, default=0.0,
+                        help="fraction of generated documents with a printed table of contents (default: %(default)s)")
+    parser.add_argument("--deep-headings", type=float, default=0.2,
+                        help="fraction of generated documents with a fourth heading size (default: %(default)s)")
+    parser.add_argument("--toc-pages", type=int, default=0,
+                        help="extractor TOC sampling: leading pages searched for a TOC, 0 to disable "
+                             "(default: %(default)s)")
+    parser.add_argument("--outline-source", choices=extractor.OUTLINE_SOURCES, default="heuristics",
+                        help="extractor outline source (default: %(default)s)")
+    parser.add_argument("--low-memory", action="store_true", help="benchmark the low-memory mode")
+    parser.add_argument("--io-mode", choices=extractor.IO_MODES, default=extractor.DEFAULT_IO_MODE,
+                        help="extractor PDF I/O mode (default: %(default)s)")
+    parser.add_argument("--read-ahead", type=int, default=extractor.DEFAULT_READ_AHEAD // 1024, metavar="KB",
+                        help="extractor read block size in KB (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=1, help="throughput passes to average (default: %(default)s)")
+    parser.add_argument("--output", help="write results JSON to this file")
+    args = parser.parse_args()
+
+    extract_options = {"outline_source": args.outline_source, "low_memory": args.low_memory,
+                       "toc_pages": args.toc_pages, "io_mode": args.io_mode,
+                       "read_ahead": args.read_ahead * 1024}
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.corpus:
+            paths = sorted(glob.glob(os.path.join(args.corpus, "*.pdf")))
+        else:
+            paths = generate_corpus(tmp, docs=args.docs, pages=args.pages, seed=args.seed,
+                                    char_by_char_ratio=args.char_by_char, bookmark_ratio=args.bookmarks,
+                                    toc_ratio=args.toc, deep_ratio=args.deep_headings)
+        results = run(paths, extract_options, repeat=args.repeat)
+
+    print_summary(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
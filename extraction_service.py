@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Resident outline extraction service.
+
+Keeps a pool of pre-warmed worker processes and serves single documents over
+HTTP (TCP or a Unix socket), so each request skips interpreter startup, the
+pdfplumber/pdfminer import and directory scanning.
+
+    POST /extract   raw PDF body (Content-Type: application/pdf), or
+                    {"path": "/abs/file.pdf"} for files under a --path-root.
+                    Optional "outline_source" / "segment_words" in the JSON
+                    body or query string. Returns {"title", "outline"}.
+    GET  /health    liveness and pool status
+    GET  /stats     request counters, latency and per-stage timings
+
+Requests beyond the workers plus --queue-size waiting slots are rejected with
+503 and a Retry-After header, so callers see backpressure instead of
+unbounded latency.
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import logging
+import argparse
+import socketserver
+import tempfile
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from pdf_outline_extractor import (
+    DEFAULT_CACHE_BYTES, DEFAULT_CACHE_DIR, DEFAULT_DOC_TIMEOUT, DEFAULT_IO_MODE, DEFAULT_LOG_LEVEL,
+    DEFAULT_READ_AHEAD, IO_MODES, LOG_LEVELS, OUTLINE_SOURCES, OutlineCache, configure_logging, load_heading_rules,
+    log, process_pdf,
+)
+
+DEFAULT_PORT = 8080
+DEFAULT_QUEUE_SIZE = 16
+DEFAULT_MAX_UPLOAD_MB = 100
+UPLOAD_CHUNK_BYTES = 1 << 20
+RETRY_AFTER_SECONDS = 1
+
+# Per-request overrides accepted on top of the service's extraction options
+REQUEST_OPTIONS = {"outline_source": OUTLINE_SOURCES, "segment_words": (True, False)}
+
+
+class ServiceOverloaded(Exception):
+    """All workers are busy and the waiting queue is full"""
+
+
+class RequestError(Exception):
+    """A request the service cannot serve; carries the HTTP status to reply with"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _warm_worker(log_level):
+    """Pool initializer: runs once per worker process at startup. Importing the
+    extractor (and with it pdfplumber/pdfminer) happens here for spawned
+    workers; forked workers inherit it."""
+    configure_logging(log_level)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent handles Ctrl-C
+
+
+def _ping():
+    return os.getpid()
+
+
+class ExtractionService:
+    """A warm ProcessPoolExecutor behind an admission limit.
+
+    At most `workers` documents are extracted at once and at most
+    `queue_size` more wait for a worker. Requests take a slot with
+    admission() before doing any work, including reading an upload, and
+    get ServiceOverloaded when none is free. If a worker dies, the pool is replaced and the affected
+    request fails, but the service keeps running.
+    """
+
+    def __init__(self, workers, queue_size=DEFAULT_QUEUE_SIZE, timeout=DEFAULT_DOC_TIMEOUT, cache=None,
+                 path_roots=(), extract_options=None):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.cache = cache
+        self.path_roots = [os.path.realpath(root) for root in path_roots]
+        self.extract_options = extract_options or {}
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._started = time.time()
+        self._in_flight = 0
+        self._counts = defaultdict(int)
+        self._latency = {"seconds": 0.0, "max": 0.0}
+        self._stages = defaultdict(lambda: {"seconds": 0.0, "calls": 0})
+
+    def start(self):
+        self._pool = self._new_pool()
+        log.info("Started %d warm worker(s)", self.workers)
+
+    def _new_pool(self):
+        pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker,
+                                   initargs=(logging.getLevelName(log.getEffectiveLevel()),))
+        # Start every worker now rather than on the first requests
+        for future in [pool.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+        return pool
+
+    def close(self):
+        if self._pool:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def resolve_path(self, path):
+        """Map a client-supplied path to a real file under one of the path roots"""
+        if not self.path_roots:
+            raise RequestError(403, "path submissions are disabled (start the service with --path-root)")
+        real = os.path.realpath(path)
+        if not any(os.path.commonpath([real, root]) == root for root in self.path_roots):
+            raise RequestError(403, f"{path} is outside the allowed path roots")
+        if not os.path.isfile(real):
+            raise RequestError(404, f"{path} does not exist")
+        return real
+
+    @contextmanager
+    def admission(self):
+        """Hold one of the workers + queue_size request slots for the block;
+        raises ServiceOverloaded at once when none is free"""
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected")
+            raise ServiceOverloaded()
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    def submit(self, pdf_path, options=None):
+        """Extract one document; returns (output_data, error, metrics).
+        Callers hold a slot from admission()."""
+        start = time.perf_counter()
+        try:
+            with self._lock:
+                self._in_flight += 1
+            return self._extract(pdf_path, {**self.extract_options, **(options or {})})
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                elapsed = time.perf_counter() - start
+                self._latency["seconds"] += elapsed
+                self._latency["max"] = max(self._latency["max"], elapsed)
+
+    def _extract(self, pdf_path, extract_options):
+        key = None
+        if self.cache is not None:
+            key = self.cache.key_for(pdf_path, extract_options)
+            with self._lock:
+                output_data = self.cache.get(key)
+            if output_data is not None:
+                self._count("cached")
+                return output_data, None, None
+
+        pool = self._pool
+        try:
+            output_data, error, metrics = pool.submit(process_pdf, pdf_path, self.timeout,
+                                                      **extract_options).result()
+        except BrokenProcessPool:
+            with self._lock:
+                if self._pool is pool:
+                    log.warning("Worker pool broke, starting a new one")
+                    self._pool = self._new_pool()
+            output_data, error, metrics = None, "worker process crashed", None
+
+        self._count("failed" if error else "ok", metrics)
+        if key is not None and not error:
+            with self._lock:
+                self.cache.put(key, output_data)
+        return output_data, error, metrics
+
+    def _count(self, status, metrics=None):
+        with self._lock:
+            self._counts[status] += 1
+            for name, stage in (metrics or {}).get("stages", {}).items():
+                self._stages[name]["seconds"] += stage["seconds"]
+                self._stages[name]["calls"] += stage["calls"]
+
+    def stats(self):
+        with self._lock:
+            completed = sum(self._counts[status] for status in ("ok", "failed", "cached"))
+            return {
+                "uptime_seconds": round(time.time() - self._started, 1),
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "in_flight": self._in_flight,
+                "requests": dict(self._counts),
+                "latency_seconds": {
+                    "mean": round(self._latency["seconds"] / completed, 6) if completed else None,
+                    "max": round(self._latency["max"], 6),
+                },
+                "cache": {"hits": self.cache.hits, "misses": self.cache.misses} if self.cache else None,
+                "stages": {name: {"seconds": round(stage["seconds"], 6), "calls": stage["calls"]}
+                           for name, stage in sorted(self._stages.items())},
+            }
+
+
+class ExtractionRequestHandler(BaseHTTPRequestHandler):
+    server_version = "OutlineExtractor/1"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def do_GET(self):
+        route = urlsplit(self.path).path
+        if route == "/health":
+            self._reply(200, {"status": "ok", "workers": self.service.workers,
+                              "in_flight": self.service.stats()["in_flight"]})
+        elif route == "/stats":
+            self._reply(200, self.service.stats())
+        else:
+            self._reply(404, {"error": f"no such endpoint: {route}"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != "/extract":
+            self._discard_body()
+            self._reply(404, {"error": f"no such endpoint: {url.path}"})
+            return
+
+        upload = None
+        try:
+            # Admission comes first, so a rejected request costs no body read
+            # and no spool space
+            with self.service.admission():
+                options = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                content_type = self.headers.get("Content-Type", "").split(";")[0].strip()
+                if content_type == "application/json":
+                    request = json.loads(self._read_body(self.server.max_json_bytes) or b"{}")
+                    if not isinstance(request, dict) or not request.get("path"):
+                        raise RequestError(400, 'expected a JSON object with a "path"')
+                    if not isinstance(request["path"], str):
+                        raise RequestError(400, '"path" must be a string')
+                    options.update((k, v) for k, v in request.items() if k != "path")
+                    pdf_path = self.service.resolve_path(request["path"])
+                else:
+                    upload = self._spool_upload()
+                    pdf_path = upload
+                options = _parse_options(options)
+
+                output_data, error, metrics = self.service.submit(pdf_path, options)
+            if error:
+                self._reply(422, {"error": error})
+            else:
+                headers = {}
+                if metrics:
+                    headers["X-Extraction-Seconds"] = f"{metrics['seconds']:.3f}"
+                self._reply(200, output_data, headers)
+        except ServiceOverloaded:
+            self._discard_body()
+            self._reply(503, {"error": "service overloaded, retry later"},
+                        {"Retry-After": str(RETRY_AFTER_SECONDS)})
+        except RequestError as e:
+            self._discard_body()
+            self._reply(e.status, {"error": str(e)})
+        except ValueError as e:
+            self._discard_body()
+            self._reply(400, {"error": f"invalid request: {e}"})
+        finally:
+            if upload:
+                os.remove(upload)
+
+    def _content_length(self, limit):
+        length = self.headers.get("Content-Length")
+        if length is None:
+            raise RequestError(411, "Content-Length required")
+        length = int(length)
+        if length < 0:
+            raise RequestError(400, f"invalid Content-Length: {length}")
+        if length > limit:
+            self._discard_body()
+            raise RequestError(413, f"request body larger than {limit} bytes")
+        return length
+
+    def _read_body(self, limit):
+        return self.rfile.read(self._content_length(limit))
+
+    def _discard_body(self):
+        # An unread body would be parsed as the next request; drop the connection instead
+        self.close_connection = True
+
+    def _spool_upload(self):
+        """Stream an uploaded PDF to a temp file; returns its path"""
+        remaining = self._content_length(self.server.max_upload_bytes)
+        if not remaining:
+            raise RequestError(400, "empty upload")
+        fd, path = tempfile.mkstemp(suffix=".pdf", dir=self.server.spool_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while remaining:
+                    chunk = self.rfile.read(min(remaining, UPLOAD_CHUNK_BYTES))
+                    if not chunk:
+                        raise RequestError(400, "upload ended early")
+                    f.write(chunk)
+                    remaining -= len(chunk)
+        except BaseException:
+            os.remove(path)
+            raise
+        return path
+
+    def _reply(self, status, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self):
+        # Unix-socket clients have no address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        log.info("%s %s", self.address_string(), format % args)
+
+
+def _parse_options(options):
+    """Validate per-request extraction overrides"""
+    parsed = {}
+    for name, value in options.items():
+        if name not in REQUEST_OPTIONS:
+            raise RequestError(400, f"unknown option: {name}")
+        if name == "segment_words" and isinstance(value, str):
+            value = value.lower() in ("1", "true", "yes")
+        if value not in REQUEST_OPTIONS[name]:
+            raise RequestError(400, f"invalid {name}: {value!r}")
+        parsed[name] = value
+    return parsed
+
+
+class UnixHTTPServer(ThreadingHTTPServer):
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        # Skip HTTPServer.server_bind, which expects a (host, port) address
+        socketserver.TCPServer.server_bind(self)
+        self.server_name = "localhost"
+        self.server_port = 0
+
+
+def make_server(service, host="127.0.0.1", port=DEFAULT_PORT, unix_socket=None,
+                max_upload_bytes=DEFAULT_MAX_UPLOAD_MB * 1024 * 1024, spool_dir=None):
+    if unix_socket:
+        server = UnixHTTPServer(unix_socket, ExtractionRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), ExtractionRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.max_upload_bytes = max_upload_bytes
+    server.max_json_bytes = 64 * 1024
+    server.spool_dir = spool_dir
+    return server
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve PDF outline extraction over HTTP")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="TCP port (default: %(default)s)")
+    parser.add_argument("--unix-socket", help="listen on this Unix socket path instead of TCP")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="warm worker processes, i.e. documents extracted at once (default: CPU count)")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE,
+                        help="requests allowed to wait for a worker before new ones get 503 "
+                             "(default: %(default)s)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_DOC_TIMEOUT,
+                        help="per-document timeout in seconds, 0 to disable (default: %(default)s)")
+    parser.add_argument("--max-upload-mb", type=int, default=DEFAULT_MAX_UPLOAD_MB,
+                        help="largest accepted upload (default: %(default)s)")
+    parser.add_argument("--spool-dir", help="directory for uploaded PDFs while they are processed "
+                                            "(default: system temp dir)")
+    parser.add_argument("--path-root", action="append", default=[], metavar="DIR",
+                        help="allow {\"path\": ...} requests for files under DIR; may be repeated")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help="directory for the outline cache (default: %(default)s)")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_BYTES // (1024 * 1024),
+                        help="maximum cache size in MB (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true", help="neither read nor write the outline cache")
+    parser.add_argument("--outline-source", choices=OUTLINE_SOURCES, default="bookmarks",
+                        help="default outline source (default: %(default)s)")
+    parser.add_argument("--low-memory", action="store_true", help="use the low-memory extraction mode")
+    parser.add_argument("--ocr", action="store_true", help="OCR pages that have no text layer")
+    parser.add_argument("--segment-words", action="store_true",
+                        help="split glued words in headings by default")
+    parser.add_argument("--heading-rules", metavar="PATH", help="JSON heading rules profile")
+    parser.add_argument("--io-mode", choices=IO_MODES, default=DEFAULT_IO_MODE,
+                        help="how PDFs are read (default: %(default)s)")
+    parser.add_argument("--read-ahead", type=int, default=DEFAULT_READ_AHEAD // 1024, metavar="KB",
+                        help="size of each block read from a PDF in KB (default: %(default)s)")
+    parser.add_argument("--log-level", type=str.upper, choices=LOG_LEVELS, default=DEFAULT_LOG_LEVEL,
+                        help="logging verbosity; INFO logs every request (default: %(default)s)")
+    args = parser.parse_args(argv)
+    if args.heading_rules:
+        # Checked here, or every request would fail with 422
+        try:
+            load_heading_rules(args.heading_rules)
+        except (OSError, ValueError) as e:
+            parser.error(f"--heading-rules: {e}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_logging(args.log_level)
+
+    ocr_options = {}
+    if args.ocr:
+        ocr_options = {"ocr": True, "ocr_cache_dir": None if args.no_cache else os.path.join(args.cache_dir, "ocr")}
+    cache = None
+    if not args.no_cache:
+        cache = OutlineCache(args.cache_dir, max_bytes=args.cache_size * 1024 * 1024)
+    service = ExtractionService(max(1, args.workers), queue_size=max(0, args.queue_size),
+                                timeout=args.timeout or None, cache=cache, path_roots=args.path_root,
+                                extract_options={"outline_source": args.outline_source,
+                                                 "segment_words": args.segment_words,
+                                                 "low_memory": args.low_memory,
+                                                 "heading_rules": args.heading_rules,
+                                                 "io_mode": args.io_mode,
+                                                 "read_ahead": max(4, args.read_ahead) * 1024, **ocr_options})
+    service.start()
+    server = make_server(service, args.host, args.port, args.unix_socket,
+                         max_upload_bytes=args.max_upload_mb * 1024 * 1024, spool_dir=args.spool_dir)
+
+    # SIGTERM (docker stop) shuts down like Ctrl-C; shutdown() must not run on
+    # the thread that is inside serve_forever()
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+    where = args.unix_socket or f"http://{args.host}:{args.port}"
+    print(f"Serving outline extraction on {where} with {service.workers} worker(s)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if args.unix_socket and os.path.exists(args.unix_socket):
+            os.remove(args.unix_socket)
+
+
+if __name__ == "__main__":
+    main()
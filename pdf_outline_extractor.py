@@ -1,391 +1,2422 @@
 import os
+import io
+import mmap
 import json
+import argparse
+import hashlib
+import gzip
+import signal
+import sys
+import resource
+import time
+import logging
+import cProfile
+import fnmatch
+import threading
+import numpy as np
 import pdfplumber
 import re
-from collections import defaultdict
+import math
+from collections import Counter, OrderedDict, defaultdict
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pdfminer.pdfpage import PDFPage, LITERAL_PAGE, LITERAL_PAGES
+from pdfminer.pdftypes import PDFStream, dict_value, list_value, resolve1
+from pdfplumber.page import Page
+
+try:
+    from PyPDF2 import PdfReader
+    from PyPDF2.generic import IndirectObject
+except ImportError:  # bookmark fast path disabled, heuristics only
+    PdfReader = None
+
+try:
+    import pytesseract
+except ImportError:  # OCR fallback disabled
+    pytesseract = None
+
+log = logging.getLogger("pdf_outline_extractor")
+
+# Batch processing: seconds a single document may take before it is abandoned,
+# and how many times a document is retried after its worker process died
+DEFAULT_DOC_TIMEOUT = 300
+MAX_DOCUMENT_ATTEMPTS = 2
+
+# Page sharding: documents with at least this many pages are split across
+# page workers when page-level parallelism is enabled
+DEFAULT_SHARD_MIN_PAGES = 50
+
+# Outline cache: bump EXTRACTOR_VERSION whenever a change to the heuristics
+# alters the extracted outlines, so stale cache entries are not served.
+# Options in NON_OUTPUT_OPTIONS only affect how fast a document is processed
+# and are left out of the cache key.
+EXTRACTOR_VERSION = "6"
+DEFAULT_CACHE_DIR = "./.outline_cache"
+DEFAULT_CACHE_BYTES = 512 * 1024 * 1024
+NON_OUTPUT_OPTIONS = {"page_workers", "shard_min_pages", "ocr_workers", "ocr_memory_mb", "ocr_cache_dir",
+                      "io_mode", "read_ahead"}
+
+# PDF I/O: files are read lazily through PdfFile, either in blocks of
+# DEFAULT_READ_AHEAD bytes (keeping up to IO_CACHE_BYTES of them per open
+# file) or memory-mapped, so only the xref, the outline and the parsed pages
+# are fetched from storage
+IO_MODES = ("buffered", "mmap")
+DEFAULT_IO_MODE = "buffered"
+DEFAULT_READ_AHEAD = 64 * 1024
+IO_CACHE_BYTES = 8 * 1024 * 1024
+
+# How extract_headings_from_pdf uses a PDF's embedded bookmarks
+OUTLINE_SOURCES = ("bookmarks", "heuristics", "merge")
+
+# Output formats written by process_all_pdfs, and the file name used by the
+# single-file "combined" format
+OUTPUT_FORMATS = ("json", "jsonl", "combined")
+COMBINED_OUTPUT_NAME = "outlines.jsonl"
+
+# Watch mode: how often the input directory is polled, how long a new or
+# changed PDF must keep the same size and mtime before it is treated as fully
+# written, the manifest (kept in the output directory) of processed files,
+# and the backoff before a failed file is retried (doubling up to the max)
+MANIFEST_NAME = ".manifest.json"
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_SETTLE_SECONDS = 2.0
+WATCH_RETRY_SECONDS = 30.0
+WATCH_RETRY_MAX_SECONDS = 3600.0
+
+# Instrumentation: log levels accepted by --log-level (quiet by default) and
+# the formats a run summary can be written in
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+DEFAULT_LOG_LEVEL = "WARNING"
+METRICS_FORMATS = ("json", "prometheus")
+DEFAULT_PROFILE_DIR = "./profiles"
+
+# TOC sampling: a page belongs to a printed table of contents when at least
+# TOC_MIN_ENTRIES of its rows end in dotted leaders and a page number. A TOC
+# page where most rows with leaders don't parse as entries is not trusted. The
+# offset between printed and physical page numbers is searched up to
+# TOC_MAX_PAGE_OFFSET, and a TOC is only used if at least TOC_MIN_CONFIRMED
+# of its entries are found on the pages they point to, and at least
+# TOC_MIN_ENTRIES per TOC page
+TOC_LINE_PATTERN = re.compile(r"^(?P<title>.*?[^\s.·…])\s*(?:[.·…]\s*){3,}(?P<page>\d{1,4})$")
+TOC_LEADER_PATTERN = re.compile(r"(?:[.·…]\s*){3,}")
+TOC_MIN_ENTRIES = 3
+TOC_MAX_PAGE_OFFSET = 30
+TOC_MIN_CONFIRMED = 0.6
+TOC_INDENT_TOLERANCE = 4
+
+# OCR fallback for pages without a text layer: rasterization resolution, OCR
+# worker processes, per-page time limit, per-worker address-space cap and
+# language. Words tesseract is less than OCR_MIN_CONFIDENCE sure of are
+# dropped; OCR words are classified with OCR_FONT_NAME as their font.
+DEFAULT_OCR_DPI = 300
+DEFAULT_OCR_WORKERS = 2
+DEFAULT_OCR_TIMEOUT = 60
+DEFAULT_OCR_MEMORY_MB = 2048
+DEFAULT_OCR_LANG = "eng"
+OCR_MIN_CONFIDENCE = 40
+OCR_FONT_NAME = "OCR"
+
+# Merged-word fixes applied by clean_text, and how many cleaned strings to memoize
+WORD_FIXES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "word_fixes.json")
+CLEAN_TEXT_CACHE_SIZE = 65536
+
+# Optional dictionary-based word segmentation in clean_text: the bundled
+# ranked word lists (curated heading vocabulary, then general English), the
+# shortest glued token worth splitting, the longest dictionary word
+# considered, the cost per letter of leaving an unknown token whole, and how
+# many tokens to memoize
+WORD_FREQ_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "word_freq.txt")
+GENERAL_WORD_FREQ_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "word_freq_en.txt.gz")
+SEGMENT_MIN_LENGTH = 5
+SEGMENT_MAX_WORD_LENGTH = 20
+SEGMENT_UNKNOWN_COST = 1.4
+SEGMENT_CACHE_SIZE = 65536
+
+# Low-memory mode: the fallback keeps at most this many words for each of the
+# largest font sizes (and for numbered words)
+FALLBACK_TOP_SIZES = 3
+FALLBACK_CANDIDATES_PER_SIZE = 500
+
+# Character-stream word reconstruction: a gap wider than CHAR_X_TOLERANCE x font
+# size ends a word; characters within CHAR_Y_TOLERANCE x font size of a line's
+# mean top belong to that line
+CHAR_X_TOLERANCE = 0.2
+CHAR_Y_TOLERANCE = 0.3
+
+# Line assembly: words whose tops differ by more than LINE_Y_TOLERANCE x font
+# size start a new line, and a horizontal gap wider than COLUMN_GAP x font size
+# splits a line into separate blocks (columns, table cells)
+LINE_Y_TOLERANCE = 0.5
+COLUMN_GAP = 2.0
+
+# Heading tiers: font sizes are clustered at FONT_SIZE_RESOLUTION points; sizes
+# at least HEADING_SIZE_RATIO x the body size are heading sizes. Wrapped heading
+# lines closer than BLOCK_LINE_GAP x font size are merged into one heading.
+FONT_SIZE_RESOLUTION = 0.5
+HEADING_SIZE_RATIO = 1.15
+BLOCK_LINE_GAP = 0.8
+MAX_HEADING_CHARS = 150
+MAX_HEADING_WORDS = 12
 
 # Heuristics: heading detection uses font size, style, indentation, and pattern
+NUMBERED_PATTERN = re.compile(r"^(?:[0-9]+\.?)+\s+")
 HEADING_PATTERNS = [
-    re.compile(r"^(?:[0-9]+\.?)+\s+"),   # Numbered like "1.", "1.2.3 "
+    NUMBERED_PATTERN,   # Numbered like "1.", "1.2.3 "
     re.compile(r"^[A-Z][A-Z\s]{3,}$"),   # All uppercase heading
     re.compile(r"^[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*$"),  # Title Case
 ]
 
+# Default heading rules. A rules file (--heading-rules) is a JSON object that
+# overrides any of these keys, so document families can use tuned profiles.
+DEFAULT_HEADING_RULES = {
+    "min_chars": 2,
+    "max_chars": MAX_HEADING_CHARS,
+    "max_words": MAX_HEADING_WORDS,
+    "heading_size_ratio": HEADING_SIZE_RATIO,
+    "block_line_gap": BLOCK_LINE_GAP,
+    "bold_markers": ["Bold", "bold"],
+    "italic_markers": ["Italic", "italic", "Oblique", "oblique"],
+    "patterns": [p.pattern for p in HEADING_PATTERNS],
+    "sentence_endings": [".", ","],
+    # Level given to short body-size lines in a bold / italic font (null: never)
+    "body_bold_level": "H3",
+    "body_italic_level": None,
+}
+
 def is_bold(fontname):
     return "Bold" in fontname or "bold" in fontname
 
-def clean_text(text):
-    """Clean and properly format text with word breaks"""
+def load_heading_rules(path=None):
+    """Load a heading rules profile and merge it over DEFAULT_HEADING_RULES.
+    Raises ValueError for unknown keys or patterns that don't compile."""
+    rules = dict(DEFAULT_HEADING_RULES)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            overrides = json.load(f)
+        unknown = set(overrides) - set(DEFAULT_HEADING_RULES)
+        if unknown:
+            raise ValueError(f"Unknown heading rules in {path}: {', '.join(sorted(unknown))}")
+        rules.update(overrides)
+        for pattern in rules["patterns"]:
+            try:
+                re.compile(pattern)
+            except (re.error, TypeError) as e:
+                raise ValueError(f"Invalid heading pattern {pattern!r} in {path}: {e}") from None
+    return rules
+
+def load_word_fixes(path=WORD_FIXES_PATH):
+    """Load the merged-word fix table ({"Connectthe": "Connect the", ...})"""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def compile_word_fixes(fixes):
+    """Compile a fix table into one alternation regex.
+
+    Longer keys are tried first so that e.g. "Connectingthe" wins over a
+    shorter fix that is a prefix of it.
+    """
+    if not fixes:
+        return None
+    return re.compile("|".join(re.escape(k) for k in sorted(fixes, key=len, reverse=True)))
+
+def load_word_costs(paths=(WORD_FREQ_PATH, GENERAL_WORD_FREQ_PATH)):
+    """Load the ranked word lists as {word: cost}, where cost is the negative
+    log probability of the word under Zipf's law for its rank. Each list
+    ranks after the previous ones; .gz lists are read compressed."""
+    words = []
+    for path in paths:
+        with (gzip.open if path.endswith(".gz") else open)(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                word = line.strip().lower()
+                if word and not word.startswith("#"):
+                    words.append(word)
+    log_harmonic = math.log(math.log(len(words)) + 0.5772)
+    costs = {}
+    for rank, word in enumerate(words, start=1):
+        costs.setdefault(word, math.log(rank) + log_harmonic)
+    return costs
+
+@lru_cache(maxsize=None)
+def _word_costs():
+    # Loaded on first use so runs without segmentation don't pay for it
+    return load_word_costs()
+
+@lru_cache(maxsize=SEGMENT_CACHE_SIZE)
+def segment_word(word):
+    """Split a run of glued letters into dictionary words ("floodedwith" ->
+    "flooded with") using dynamic programming over the word costs.
+
+    Words that are short or already in the dictionary are returned
+    unchanged. So are unknown words whose cheapest split costs more than
+    keeping them whole (SEGMENT_UNKNOWN_COST per letter), which leaves
+    compounds like "onboarding" alone. Single letters other than "a" and "i"
+    are never split off.
+    """
+    costs = _word_costs()
+    lower = word.lower()
+    if len(word) < SEGMENT_MIN_LENGTH or lower in costs:
+        return word
+    
+    n = len(lower)
+    best = [0.0] + [math.inf] * n
+    split = [0] * (n + 1)
+    for end in range(1, n + 1):
+        for start in range(max(0, end - SEGMENT_MAX_WORD_LENGTH), end):
+            piece = lower[start:end]
+            cost = costs.get(piece) if len(piece) > 1 or piece in "ai" else None
+            if cost is not None and best[start] + cost < best[end]:
+                best[end] = best[start] + cost
+                split[end] = start
+    if best[n] >= SEGMENT_UNKNOWN_COST * n:
+        return word
+    
+    pieces = []
+    while n > 0:
+        pieces.append(word[split[n]:n])
+        n = split[n]
+    return " ".join(reversed(pieces))
+
+WORD_FIXES = load_word_fixes()
+_WORD_FIXES_RE = compile_word_fixes(WORD_FIXES)
+_WHITESPACE_RE = re.compile(r'\s+')
+_CAMEL_CASE_RE = re.compile(r'([a-z])([A-Z])')
+_GLUED_WORD_RE = re.compile(r'(?<![A-Za-z])[A-Z]?[a-z]+(?![A-Za-z])')
+
+@lru_cache(maxsize=CLEAN_TEXT_CACHE_SIZE)
+def clean_text(text, segment=False):
+    """Clean and properly format text with word breaks.
+
+    With segment=True, words the fix table doesn't know about are also split
+    using the bundled word-frequency table (see segment_word).
+    """
     if not text:
         return ""
     
     # Remove extra whitespace
-    text = re.sub(r'\s+', ' ', text.strip())
+    text = _WHITESPACE_RE.sub(' ', text.strip())
     
     # Fix common word separation issues
     # Add spaces before capital letters that are likely word boundaries
-    text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text)
-    
-    # Fix specific patterns like "Connectthedots" -> "Connect the dots"
-    text = re.sub(r'([a-z])([A-Z][a-z]+)', r'\1 \2', text)
-    
-    # Fix specific merged words from the PDF
-    text = re.sub(r'Connectthe', 'Connect the', text)
-    text = re.sub(r'Welcometo', 'Welcome to', text)
-    text = re.sub(r'Connectingthe', 'Connecting the', text)
-    text = re.sub(r'Areyouin', 'Are you in', text)
-    text = re.sub(r'andconnect', 'and connect', text)
-    text = re.sub(r'Inaworld', 'In a world', text)
-    text = re.sub(r'floodedwith', 'flooded with', text)
-    text = re.sub(r'Buildabeautiful', 'Build a beautiful', text)
-    text = re.sub(r'Youmustbuild', 'You must build', text)
-    text = re.sub(r'asolutionthat', 'a solution that', text)
-    text = re.sub(r'Bybuildingan', 'By building an', text)
-    text = re.sub(r'outlineextractor', 'outline extractor', text)
-    text = re.sub(r'Thisoutlinewill', 'This outline will', text)
-    text = re.sub(r'bethefoundation', 'be the foundation', text)
-    text = re.sub(r'fortherestof', 'for the rest of', text)
-    text = re.sub(r'yourhackathon', 'your hackathon', text)
-    text = re.sub(r'Yourjobisto', 'Your job is to', text)
-    text = re.sub(r'extractastructured', 'extract a structured', text)
-    text = re.sub(r'ThroughDocs', 'Through Docs', text)
-    text = re.sub(r'Yourcontainershould', 'Your container should', text)
-    text = re.sub(r'Afterbuildingthe', 'After building the', text)
-    text = re.sub(r'Wewillbuildthe', 'We will build the', text)
-    text = re.sub(r'dockerimageusing', 'docker image using', text)
-    text = re.sub(r'thefollowingcommand', 'the following command', text)
-    text = re.sub(r'CPUarchitecture', 'CPU architecture', text)
-    text = re.sub(r'Dockerfileto', 'Dockerfile to', text)
-    text = re.sub(r'explicitlyspecify', 'explicitly specify', text)
-    text = re.sub(r'Anymodelsor', 'Any models or', text)
-    text = re.sub(r'librariesused', 'libraries used', text)
-    text = re.sub(r'Yourapproach', 'Your approach', text)
-    text = re.sub(r'Alldependencies', 'All dependencies', text)
-    text = re.sub(r'installedwithin', 'installed within', text)
-    text = re.sub(r'thecontainer', 'the container', text)
-    text = re.sub(r'Total45', 'Total 45', text)
-    text = re.sub(r'MultilingualHandling', 'Multilingual Handling', text)
-    text = re.sub(r'Nointernetaccess', 'No internet access', text)
-    text = re.sub(r'allowedduring', 'allowed during', text)
-    text = re.sub(r'Sectiontitle', 'Section title', text)
-    text = re.sub(r'Pagenumber', 'Page number', text)
-    text = re.sub(r'Processingtimestamp', 'Processing timestamp', text)
-    text = re.sub(r'Jobtobedone', 'Job to be done', text)
-    text = re.sub(r'Inputdocuments', 'Input documents', text)
-    text = re.sub(r'Theoutputshould', 'The output should', text)
-    text = re.sub(r'TestCase', 'Test Case', text)
-    text = re.sub(r'Qualityof', 'Quality of', text)
-    text = re.sub(r'granularsubsection', 'granular subsection', text)
-    text = re.sub(r'Howwell', 'How well', text)
-    text = re.sub(r'selectedsections', 'selected sections', text)
-    text = re.sub(r'Dockerfileand', 'Dockerfile and', text)
-    text = re.sub(r'executioninstructions', 'execution instructions', text)
-    text = re.sub(r'Summarizethe', 'Summarize the', text)
-    text = re.sub(r'financialsof', 'financials of', text)
-    text = re.sub(r'corporationxyz', 'corporation xyz', text)
-    text = re.sub(r'Providea', 'Provide a', text)
-    text = re.sub(r'literaturereview', 'literature review', text)
-    text = re.sub(r'foragiven', 'for a given', text)
-    text = re.sub(r'topicand', 'topic and', text)
-    text = re.sub(r'availableresearch', 'available research', text)
-    text = re.sub(r'Researchpapers', 'Research papers', text)
-    text = re.sub(r'Documentcollection', 'Document collection', text)
-    text = re.sub(r'Concretetask', 'Concrete task', text)
-    text = re.sub(r'thepersona', 'the persona', text)
-    text = re.sub(r'needsto', 'needs to', text)
-    text = re.sub(r'Youwillbuild', 'You will build', text)
-    text = re.sub(r'asystemthat', 'a system that', text)
-    text = re.sub(r'actsasan', 'acts as an', text)
-    text = re.sub(r'intelligentdocument', 'intelligent document', text)
-    text = re.sub(r'ChallengeBrief', 'Challenge Brief', text)
-    text = re.sub(r'ConnectWhat', 'Connect What', text)
-    text = re.sub(r'Forthe', 'For the', text)
-    text = re.sub(r'UserWho', 'User Who', text)
-    text = re.sub(r'WhatYou', 'What You', text)
-    text = re.sub(r'Needto', 'Need to', text)
-    text = re.sub(r'WhatNotto', 'What Not to', text)
-    text = re.sub(r'ForSample', 'For Sample', text)
-    text = re.sub(r'Inputand', 'Input and', text)
-    text = re.sub(r'OutputFiles', 'Output Files', text)
-    text = re.sub(r'pleaserefer', 'please refer', text)
-    text = re.sub(r'totheappendix', 'to the appendix', text)
-    text = re.sub(r'SubmissionChecklist', 'Submission Checklist', text)
-    text = re.sub(r'ScoringCriteria', 'Scoring Criteria', text)
-    text = re.sub(r'CriteriaPoints', 'Criteria Points', text)
-    text = re.sub(r'RequiredOutput', 'Required Output', text)
-    text = re.sub(r'AcademicResearch', 'Academic Research', text)
-    text = re.sub(r'SampleTest', 'Sample Test', text)
-    text = re.sub(r'BusinessAnalysis', 'Business Analysis', text)
-    text = re.sub(r'EducationalContent', 'Educational Content', text)
-    text = re.sub(r'DocumentCollection', 'Document Collection', text)
-    text = re.sub(r'InputSpecification', 'Input Specification', text)
+    text = _CAMEL_CASE_RE.sub(r'\1 \2', text)
+    
+    # Fix specific merged words ("Connectthe" -> "Connect the") in one pass
+    if _WORD_FIXES_RE is not None:
+        text = _WORD_FIXES_RE.sub(lambda m: WORD_FIXES[m.group(0)], text)
+    
+    if segment:
+        text = _GLUED_WORD_RE.sub(lambda m: segment_word(m.group(0)), text)
     
     # Clean up multiple spaces
-    text = re.sub(r'\s+', ' ', text)
+    text = _WHITESPACE_RE.sub(' ', text)
     
     return text.strip()
 
-def reconstruct_words_from_characters(chars_data):
-    """Reconstruct words from individual character data"""
-    if not chars_data:
+class Word:
+    """A positioned word: the unit passed from page parsing to line assembly"""
+    __slots__ = ("text", "size", "fontname", "x0", "x1", "top", "bottom")
+
+    def __init__(self, text, size, fontname, x0, x1, top, bottom):
+        self.text = text
+        self.size = size
+        self.fontname = fontname
+        self.x0 = x0
+        self.x1 = x1
+        self.top = top
+        self.bottom = bottom
+
+    def __repr__(self):
+        return f"Word({self.text!r}, size={self.size}, x0={self.x0:.1f}, top={self.top:.1f})"
+
+def reconstruct_words_from_chars(chars, x_tolerance=CHAR_X_TOLERANCE, y_tolerance=CHAR_Y_TOLERANCE):
+    """Rebuild words from a page's individual characters in a single pass.
+
+    Characters are clustered into lines by vertical position: a character
+    joins the current line while its top is within y_tolerance x font size
+    of the line's running mean top, so lines are never split at arbitrary
+    rounding boundaries. Within a line, characters are taken left to right
+    and a word ends at whitespace or where the gap to the previous character
+    exceeds x_tolerance x font size. Returns Word records in reading order.
+    """
+    if not chars:
         return []
     
+    lines = []
+    line = []
+    line_top = 0.0
+    for char in sorted(chars, key=lambda c: c['top']):
+        if line and abs(char['top'] - line_top) > y_tolerance * char['size']:
+            lines.append(line)
+            line = []
+        line.append(char)
+        line_top += (char['top'] - line_top) / len(line)
+    lines.append(line)
+    
     words = []
-    current_word = ""
-    current_word_data = None
+    for line in lines:
+        line.sort(key=lambda c: c['x0'])
+        pieces = []
+        first = previous = None
+        for char in line:
+            text = char['text']
+            if text.isspace() or (previous is not None
+                                  and char['x0'] - previous['x1'] > x_tolerance * char['size']):
+                if pieces:
+                    words.append(Word("".join(pieces), first['size'], first['fontname'],
+                                      first['x0'], previous['x1'], first['top'], first['bottom']))
+                    pieces = []
+                if text.isspace():
+                    previous = None
+                    continue
+            if not pieces:
+                first = char
+            pieces.append(text)
+            previous = char
+        if pieces:
+            words.append(Word("".join(pieces), first['size'], first['fontname'],
+                              first['x0'], previous['x1'], first['top'], first['bottom']))
+    
+    return words
+
+class HeadingClassifier:
+    """Classifies a document's lines as headings against its FontTiers.
+
+    Built once per document. Font properties (bold, italic, family and the
+    size tier of each font/size pair) and the text checks (length, letters,
+    word count, upper case, HEADING_PATTERNS) are computed once per distinct
+    value and memoized, since running headers, repeated labels and a handful
+    of fonts make up most lines. `rules` is a dict from load_heading_rules.
+    `tiers` may be None until the document's tiers are known; only
+    candidate() works without them.
+    """
+
+    def __init__(self, tiers, rules=None):
+        rules = rules or DEFAULT_HEADING_RULES
+        self.tiers = tiers
+        self.rules = rules
+        self.min_chars = rules["min_chars"]
+        self.max_chars = rules["max_chars"]
+        self.max_words = rules["max_words"]
+        self.bold_markers = tuple(rules["bold_markers"])
+        self.italic_markers = tuple(rules["italic_markers"])
+        self.patterns = [re.compile(p) for p in rules["patterns"]]
+        self.sentence_endings = tuple(rules["sentence_endings"])
+        self.body_bold_level = rules["body_bold_level"]
+        self.body_italic_level = rules["body_italic_level"]
+        self._fonts = {}
+        self._texts = {}
+        self._headlines = {}
+
+    def font(self, fontname, size):
+        """(bold, italic, family, level, is_body) for a font at a size"""
+        key = (fontname, size)
+        props = self._fonts.get(key)
+        if props is None:
+            # Subset fonts are named "ABCDEF+Family-Style"
+            family = fontname.split("+", 1)[-1].split("-", 1)[0].split(",", 1)[0]
+            props = self._fonts[key] = (
+                any(m in fontname for m in self.bold_markers),
+                any(m in fontname for m in self.italic_markers),
+                family,
+                self.tiers.level_for(size),
+                abs(size - self.tiers.body_size) <= FONT_SIZE_RESOLUTION,
+            )
+        return props
+
+    def text(self, text):
+        """(word_count, sentence) for a line's text, or None when it can't be
+        a heading at all (too short or long, no letters)"""
+        features = self._texts.get(text, False)
+        if features is False:
+            stripped = text.strip()
+            if (not self.min_chars <= len(stripped) <= self.max_chars
+                    or not any(c.isalpha() for c in stripped)):
+                features = None
+            else:
+                features = (len(stripped.split()), stripped.endswith(self.sentence_endings))
+            self._texts[text] = features
+        return features
+
+    def headline(self, text):
+        """Whether a line's text is upper case or matches one of the patterns"""
+        result = self._headlines.get(text)
+        if result is None:
+            stripped = text.strip()
+            result = self._headlines[text] = (stripped.isupper()
+                                              or any(p.match(stripped) for p in self.patterns))
+        return result
+
+    def candidate(self, text, fontname):
+        """Whether a line could be a heading at some font size. Used to drop
+        lines before the tiers are known, so nothing is memoized."""
+        stripped = text.strip()
+        if (not self.min_chars <= len(stripped) <= self.max_chars
+                or not any(c.isalpha() for c in stripped)):
+            return False
+        return (len(stripped.split()) <= self.max_words or any(m in fontname for m in self.bold_markers)
+                or stripped.isupper() or any(p.match(stripped) for p in self.patterns))
+
+    def emphasized(self, fontname):
+        """Whether a font is bold or italic by the rules' markers"""
+        return any(m in fontname for m in self.bold_markers + self.italic_markers)
+
+    def classify(self, text, size, fontname):
+        """Returns (True, level) if the line is a heading, else (False, None).
+
+        Lines set in one of the heading sizes take that size's level, and
+        body-size lines only count when they are bold (or italic, if the
+        rules give italics a level), short and don't read like a sentence.
+        """
+        features = self.text(text)
+        if features is None:
+            return False, None
+        word_count, sentence = features
+        bold, italic, _, level, is_body = self.font(fontname, size)
+        if level:
+            if bold or word_count <= self.max_words or self.headline(text):
+                return True, level
+        elif is_body and word_count <= self.max_words and not sentence:
+            if bold and self.body_bold_level:
+                return True, self.body_bold_level
+            if italic and self.body_italic_level:
+                return True, self.body_italic_level
+        return False, None
+
+def is_heading(text, size, fontname, tiers, rules=None):
+    """Returns (True, level) if the line is a heading, else (False, None).
+
+    Convenience wrapper for classifying a single line; documents use one
+    HeadingClassifier for all their lines.
+    """
+    return HeadingClassifier(tiers, rules).classify(text, size, fontname)
+
+class FontTiers:
+    """Document-level font size clusters: the body text size and the heading
+    sizes (largest first). The two largest map to H1 and H2, all smaller ones
+    to H3"""
+
+    def __init__(self, body_size, heading_sizes):
+        self.body_size = body_size
+        self.heading_sizes = heading_sizes
+
+    def level_for(self, size):
+        """Heading level for a font size, or None for body-sized text"""
+        for level, heading_size in zip(("H1", "H2"), self.heading_sizes):
+            if size >= heading_size - FONT_SIZE_RESOLUTION / 2:
+                return level
+        if self.heading_sizes and size >= self.heading_sizes[-1] - FONT_SIZE_RESOLUTION / 2:
+            return "H3"
+        return None
+
+    def __repr__(self):
+        return f"FontTiers(body_size={self.body_size}, heading_sizes={self.heading_sizes})"
+
+def compute_font_tiers(sizes, weights, ratio=HEADING_SIZE_RATIO):
+    """Cluster a document's font sizes into FontTiers.
+
+    `sizes` are line font sizes and `weights` their character counts. Sizes
+    are rounded to FONT_SIZE_RESOLUTION; the size carrying the most characters
+    is the body size. Sizes at least `ratio` times the body size
+    are heading sizes: the largest is H1, the next H2, and all smaller
+    ones H3.
+    """
+    sizes = np.asarray(sizes, dtype=float)
+    if not sizes.size:
+        return FontTiers(0.0, [])
+    rounded = np.round(sizes / FONT_SIZE_RESOLUTION) * FONT_SIZE_RESOLUTION
+    unique_sizes, inverse = np.unique(rounded, return_inverse=True)
+    totals = np.bincount(inverse, weights=np.asarray(weights, dtype=float))
+    body_size = float(unique_sizes[np.argmax(totals)])
+    heading_sizes = unique_sizes[unique_sizes >= body_size * ratio][::-1]
+    return FontTiers(body_size, [float(size) for size in heading_sizes])
+
+def _weighted_mode(groups, values, weights, group_count):
+    """For each group id in 0..group_count-1, the value with the largest total weight"""
+    value_ids, inverse = np.unique(values, return_inverse=True)
+    keys = groups * len(value_ids) + inverse
+    unique_keys, key_inverse = np.unique(keys, return_inverse=True)
+    totals = np.bincount(key_inverse, weights=weights)
+    key_groups = unique_keys // len(value_ids)
+    # Heaviest value first within each group, then take each group's first row
+    order = np.lexsort((-totals, key_groups))
+    _, first = np.unique(key_groups[order], return_index=True)
+    best = np.empty(group_count, dtype=values.dtype)
+    best[key_groups[order][first]] = value_ids[unique_keys[order][first] % len(value_ids)]
+    return best
+
+def assemble_lines(words):
+    """Group a page's words into lines.
+
+    `words` are Word records. Words are
+    ordered top to bottom and a new line starts where the vertical offset
+    to the previous word exceeds LINE_Y_TOLERANCE times the font size, or the
+    font size changes by more than FONT_SIZE_RESOLUTION. Within a line, a
+    horizontal gap wider than COLUMN_GAP times the font size (a column or
+    table cell boundary) also splits it.
+
+    Returns (text, size, fontname, x0, top, bottom) tuples in reading order,
+    where size and fontname are those carrying most of the line's characters.
+    """
+    if not words:
+        return []
+    
+    texts = [w.text for w in words]
+    font_names, font_ids = np.unique([w.fontname for w in words], return_inverse=True)
+    size, x0, x1, top, bottom = np.array([(w.size, w.x0, w.x1, w.top, w.bottom) for w in words], dtype=float).T
+    chars = np.fromiter((len(t) for t in texts), dtype=float, count=len(texts))
+    
+    # Lines: sort by top, break on vertical jumps or font size changes
+    order = np.argsort(top, kind="stable")
+    new_line = np.empty(len(order), dtype=bool)
+    new_line[0] = True
+    new_line[1:] = ((np.diff(top[order]) > LINE_Y_TOLERANCE * np.minimum(size[order][1:], size[order][:-1]))
+                    | (np.abs(np.diff(size[order])) > FONT_SIZE_RESOLUTION))
+    line_ids = np.empty(len(order), dtype=np.int64)
+    line_ids[order] = np.cumsum(new_line) - 1
+    
+    # Reading order: by line, then left to right
+    order = np.lexsort((x0, line_ids))
+    new_segment = np.empty(len(order), dtype=bool)
+    new_segment[0] = True
+    new_segment[1:] = ((np.diff(line_ids[order]) != 0)
+                       | (x0[order][1:] - x1[order][:-1] > COLUMN_GAP * size[order][1:]))
+    segment_ids = np.cumsum(new_segment) - 1
+    starts = np.flatnonzero(new_segment)
+    segment_count = len(starts)
+    
+    line_sizes = _weighted_mode(segment_ids, size[order], chars[order], segment_count)
+    line_fonts = _weighted_mode(segment_ids, font_ids[order], chars[order], segment_count)
+    line_x0 = np.minimum.reduceat(x0[order], starts)
+    line_top = np.minimum.reduceat(top[order], starts)
+    line_bottom = np.maximum.reduceat(bottom[order], starts)
     
-    for char_data in chars_data:
-        char = char_data['text']
+    ordered_texts = [texts[i] for i in order]
+    ends = list(starts[1:]) + [len(order)]
+    return [
+        (" ".join(ordered_texts[start:end]), round(float(line_sizes[i]), 2), str(font_names[line_fonts[i]]),
+         float(line_x0[i]), float(line_top[i]), float(line_bottom[i]))
+        for i, (start, end) in enumerate(zip(starts, ends))
+    ]
+
+def extract_page_words(page, page_num, metrics=None):
+    """Return the Word records of a single page"""
+    if metrics is None:
+        metrics = DocumentMetrics()
+    log.debug("  Processing page %d...", page_num)
+    
+    # pdfplumber parses a page's layout lazily on first access; do it up
+    # front so parsing and word extraction are timed separately
+    with metrics.stage("parse", page_num):
+        page.chars
+    
+    # Try to extract words first
+    with metrics.stage("words", page_num):
+        words = page.extract_words(extra_attrs=["size", "fontname"])
+    
+    # If words are too short (individual characters), rebuild them from the
+    # page's characters, which extract_words has already parsed and cached
+    if words and any(len(word['text']) == 1 for word in words[:10]):
+        log.debug("    Detected character-by-character extraction, reconstructing words...")
+        with metrics.stage("reconstruct", page_num):
+            words = reconstruct_words_from_chars(page.chars)
+    else:
+        words = [Word(word['text'], word['size'], word['fontname'], word['x0'], word['x1'],
+                      word['top'], word['bottom'])
+                 for word in words]
+    
+    candidates = []
+    for word in words:
+        word.text = word.text.strip()
+        if not word.text or len(word.text) > 90:
+            continue
+        candidates.append(word)
+    
+    return candidates
+
+def extract_page_lines(page, page_num, metrics=None):
+    """Return the assembled (text, size, fontname, x0, top, bottom) lines of a single page"""
+    if metrics is None:
+        metrics = DocumentMetrics()
+    words = extract_page_words(page, page_num, metrics)
+    with metrics.stage("lines", page_num):
+        return assemble_lines(words)
+
+class FallbackCandidates:
+    """Bounded stand-in for the full per-document word list in low-memory mode.
+
+    The fallback methods only look at words in the three largest font sizes
+    and at numbered words ("1.2 ..."), so only those are kept, at most
+    `per_size` of each, and only for the largest sizes seen so far. Behaves
+    like the list it replaces: append() words, iterate in document order.
+    """
+
+    def __init__(self, max_sizes=FALLBACK_TOP_SIZES, per_size=FALLBACK_CANDIDATES_PER_SIZE):
+        self.max_sizes = max_sizes
+        self.per_size = per_size
+        self.by_size = {}
+        self.numbered = []
+        self._seq = 0
+
+    def append(self, item):
+        text, size = item[0], item[1]
+        self._seq += 1
+        record = (self._seq,) + tuple(item)
+        
+        if size in self.by_size:
+            if len(self.by_size[size]) < self.per_size:
+                self.by_size[size].append(record)
+        elif len(self.by_size) < self.max_sizes:
+            self.by_size[size] = [record]
+        else:
+            smallest = min(self.by_size)
+            if size > smallest:
+                del self.by_size[smallest]
+                self.by_size[size] = [record]
+        
+        if NUMBERED_PATTERN.match(text) and len(self.numbered) < self.per_size:
+            self.numbered.append(record)
+
+    def __iter__(self):
+        # Page order first: OCRed pages are appended after the rest
+        records = {record[0]: record for records in self.by_size.values() for record in records}
+        records.update((record[0], record) for record in self.numbered)
+        for seq in sorted(records, key=lambda seq: (records[seq][5], seq)):
+            yield records[seq][1:]
+
+def _release_page(page):
+    """Drop pdfplumber's cached layout objects for a page we are done with"""
+    if hasattr(page, "close"):
+        page.close()
+    else:
+        page.flush_cache()
+
+def _reset_peak_rss():
+    """Reset the kernel's peak-RSS counter so it can be read per document (Linux only)"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kB on Linux, bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+
+class DocumentMetrics:
+    """Wall-clock time spent in each extraction stage of one document.
+
+    Stages are timed with `with metrics.stage(name, page_num):`; time is
+    accumulated per stage for the whole document and, when a page number is
+    given, per page. as_dict() returns a picklable summary that worker
+    processes hand back to the main process.
+    """
+
+    def __init__(self, document=None):
+        self.document = document
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.pages = defaultdict(lambda: defaultdict(float))
+        self.info = {}
+        self._started = time.perf_counter()
+
+    def elapsed(self):
+        return time.perf_counter() - self._started
+
+    @contextmanager
+    def stage(self, name, page_num=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start, page_num)
+
+    def add(self, name, seconds, page_num=None, calls=1):
+        self.seconds[name] += seconds
+        self.calls[name] += calls
+        if page_num is not None:
+            self.pages[page_num][name] += seconds
+
+    def add_io(self, bytes_read, reads):
+        """Count bytes and read calls fetched from storage (see PdfFile)"""
+        self.info["io_bytes"] = self.info.get("io_bytes", 0) + bytes_read
+        self.info["io_reads"] = self.info.get("io_reads", 0) + reads
+
+    def merge_pages(self, page_timings):
+        """Fold in {page_num: {stage: seconds}} timings measured in another process"""
+        for page_num, stages in page_timings.items():
+            for name, seconds in stages.items():
+                self.add(name, seconds, page_num)
+
+    def as_dict(self):
+        return {
+            "document": self.document,
+            "seconds": round(self.elapsed(), 6),
+            **self.info,
+            "stages": {name: {"seconds": round(self.seconds[name], 6), "calls": self.calls[name]}
+                       for name in self.seconds},
+            "page_timings": [{"page": page_num, **{name: round(seconds, 6) for name, seconds in stages.items()}}
+                      for page_num, stages in sorted(self.pages.items())],
+        }
+
+class PdfFile(io.RawIOBase):
+    """Read-only, seekable view of a PDF file that only fetches what is read.
+
+    pdfminer and PyPDF2 seek to the xref at the end of the file and then to
+    each object they resolve, so a document whose outline comes from its
+    bookmarks or a few sampled pages touches a small part of the file.
+    In "buffered" mode, reads are served from aligned blocks of `read_ahead`
+    bytes, each fetched with a single read and kept in a small LRU cache;
+    reads too large to cache go straight to the file. In "mmap" mode the
+    file is memory-mapped and the kernel pages it in; each block is hinted
+    with MADV_WILLNEED the first time it is touched.
+
+    bytes_read and reads count what was fetched from storage (in mmap mode,
+    the blocks touched). If `metrics` is given, they are added to its
+    io_bytes / io_reads on close.
+    """
+
+    def __init__(self, path, io_mode=DEFAULT_IO_MODE, read_ahead=DEFAULT_READ_AHEAD, metrics=None):
+        if io_mode not in IO_MODES:
+            raise ValueError(f"Unknown I/O mode {io_mode!r}")
+        self.path = path
+        self.io_mode = io_mode
+        self.read_ahead = max(int(read_ahead), 4096)
+        self.metrics = metrics
+        self.bytes_read = 0
+        self.reads = 0
+        self._file = open(path, "rb", buffering=0)
+        self.size = os.fstat(self._file.fileno()).st_size
+        self._pos = 0
+        self._blocks = OrderedDict()
+        self._max_blocks = max(1, IO_CACHE_BYTES // self.read_ahead)
+        self._map = None
+        if io_mode == "mmap" and self.size:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if hasattr(self._map, "madvise"):
+                self._map.madvise(mmap.MADV_RANDOM)
+        if metrics is not None:
+            metrics.info["file_bytes"] = self.size
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self._pos = offset
+        return offset
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self._pos
+        start, end = self._pos, min(self._pos + size, self.size)
+        if start >= end:
+            return b""
+        data = self._read_mapped(start, end) if self._map is not None else self._read_blocks(start, end)
+        self._pos = end
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def _fetch(self, offset, size):
+        self._file.seek(offset)
+        data = self._file.read(size)
+        self.bytes_read += len(data)
+        self.reads += 1
+        return data
+
+    def _read_blocks(self, start, end):
+        first, last = start // self.read_ahead, (end - 1) // self.read_ahead
+        if last - first >= self._max_blocks // 2:
+            return self._fetch(start, end - start)
+        chunks = []
+        for index in range(first, last + 1):
+            block = self._blocks.get(index)
+            if block is None:
+                block = self._blocks[index] = self._fetch(index * self.read_ahead, self.read_ahead)
+                if len(self._blocks) > self._max_blocks:
+                    self._blocks.popitem(last=False)
+            else:
+                self._blocks.move_to_end(index)
+            chunks.append(block)
+        offset = first * self.read_ahead
+        return b"".join(chunks)[start - offset:end - offset]
+
+    def _read_mapped(self, start, end):
+        for index in range(start // self.read_ahead, (end - 1) // self.read_ahead + 1):
+            if index not in self._blocks:
+                self._blocks[index] = None
+                offset = index * self.read_ahead
+                length = min(self.read_ahead, self.size - offset)
+                if hasattr(self._map, "madvise"):
+                    self._map.madvise(mmap.MADV_WILLNEED, offset, length)
+                self.bytes_read += length
+                self.reads += 1
+        return self._map[start:end]
+
+    def close(self):
+        if self.closed:
+            return
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+        self._blocks.clear()
+        if self.metrics is not None:
+            self.metrics.add_io(self.bytes_read, self.reads)
+        super().close()
+
+def open_pdf(pdf_path, metrics=None, io_mode=DEFAULT_IO_MODE, read_ahead=DEFAULT_READ_AHEAD):
+    """pdfplumber.open over a PdfFile; closing the PDF closes the file"""
+    source = PdfFile(pdf_path, io_mode, read_ahead, metrics)
+    try:
+        pdf = pdfplumber.open(source)
+    except Exception:
+        source.close()
+        raise
+    pdf.stream_is_external = False
+    return pdf
+
+def page_count(pdf):
+    """Number of pages in a pdfplumber PDF, from the page tree's /Count
+    rather than by loading every page object"""
+    if not hasattr(pdf, "_pages"):
+        count = resolve1(dict_value(pdf.doc.catalog.get("Pages")).get("Count"))
+        if isinstance(count, int) and count > 0:
+            return count
+    return len(pdf.pages)
+
+def page_at(pdf, page_num):
+    """pdfplumber Page for a 1-based page number.
+
+    pdf.pages reads every page object in the file before returning the first
+    one. This descends the page tree by the nodes' /Count instead, reading
+    only the nodes on the way to the page (and, in unbalanced trees, the
+    siblings before them). Falls back to pdf.pages for page trees it can't
+    follow. The page's doctop starts at 0.
+    """
+    if hasattr(pdf, "_pages"):
+        return pdf.pages[page_num - 1]
+    try:
+        ref = pdf.doc.catalog["Pages"]
+        index = page_num - 1
+        inherited = {}
+        while True:
+            node = dict_value(ref)
+            attrs = dict(node)
+            for key, value in inherited.items():
+                attrs.setdefault(key, value)
+            if node.get("Type") is LITERAL_PAGE and index == 0:
+                return Page(pdf, PDFPage(pdf.doc, getattr(ref, "objid", None), attrs, None), page_number=page_num)
+            if node.get("Type") is not LITERAL_PAGES:
+                raise ValueError("malformed page tree")
+            inherited = {k: v for k, v in attrs.items() if k in PDFPage.INHERITABLE_ATTRS}
+            kids = list_value(node["Kids"])
+            if resolve1(node.get("Count")) == len(kids):
+                # One page per kid, unless a kid is an (unusual) nested /Pages
+                ref, index = kids[index], 0
+                kid = dict_value(ref)
+                if kid.get("Type") is LITERAL_PAGES and resolve1(kid.get("Count")) != 1:
+                    raise ValueError("unbalanced page tree")
+                continue
+            for ref in kids:
+                kid = dict_value(ref)
+                size = resolve1(kid.get("Count")) if kid.get("Type") is LITERAL_PAGES else 1
+                if index < size:
+                    break
+                index -= size
+            else:
+                raise IndexError(page_num)
+    except Exception:
+        return pdf.pages[page_num - 1]
+
+def extract_page_range(pdf_path, first_page, last_page, low_memory=False, io_mode=DEFAULT_IO_MODE,
+                       read_ahead=DEFAULT_READ_AHEAD):
+    """Worker for page-sharded extraction: open the PDF independently and
+    return ([(page_num, lines)], page_timings, io) for pages first_page..last_page
+    (1-based, inclusive), where page_timings is {page_num: {stage: seconds}}
+    and io is (bytes_read, reads)"""
+    metrics = DocumentMetrics()
+    pages = []
+    with metrics.stage("open"):
+        pdf = open_pdf(pdf_path, metrics, io_mode, read_ahead)
+    with pdf:
+        for page_num in range(first_page, last_page + 1):
+            page = page_at(pdf, page_num)
+            pages.append((page_num, extract_page_lines(page, page_num, metrics)))
+            if low_memory:
+                _release_page(page)
+    # Shard open time is charged to its first page
+    metrics.pages[first_page]["open"] += metrics.seconds["open"]
+    return (pages, {page_num: dict(stages) for page_num, stages in metrics.pages.items()},
+            (metrics.info["io_bytes"], metrics.info["io_reads"]))
+
+def _iter_page_lines(pdf_path, page_workers, shard_min_pages, low_memory, metrics, parsed=None,
+                     io_mode=DEFAULT_IO_MODE, read_ahead=DEFAULT_READ_AHEAD):
+    """Yield (page_num, lines) in page order, sharding the pages left to parse
+    across worker processes when there are enough to benefit. Pages already
+    in `parsed` ({page_num: lines}) are not parsed again."""
+    parsed = parsed or {}
+    with metrics.stage("open"):
+        pdf = open_pdf(pdf_path, metrics, io_mode, read_ahead)
+        total_pages = page_count(pdf)
+    metrics.info["pages"] = total_pages
+    missing = [page_num for page_num in range(1, total_pages + 1) if page_num not in parsed]
+    with pdf:
+        log.debug("  Total pages: %d", total_pages)
         
-        # If this is a space or punctuation that should end a word
-        if char.isspace() or char in ',.!?;:':
-            if current_word:
-                words.append({
-                    'text': current_word,
-                    'size': current_word_data['size'],
-                    'fontname': current_word_data['fontname'],
-                    'x0': current_word_data['x0'],
-                    'y0': current_word_data['y0']
-                })
-                current_word = ""
-                current_word_data = None
+        if page_workers <= 1 or len(missing) < shard_min_pages:
+            for page_num, page in enumerate(pdf.pages, start=1):
+                if page_num in parsed:
+                    yield page_num, parsed.pop(page_num)
+                    continue
+                lines = extract_page_lines(page, page_num, metrics)
+                if low_memory:
+                    _release_page(page)
+                yield page_num, lines
+            return
+    
+    # Contiguous shards, so each worker's pdfminer caches stay page-local;
+    # pages already parsed split the range
+    shard_size = -(-len(missing) // page_workers)
+    shards = []
+    for page_num in missing:
+        if shards and page_num == shards[-1][1] + 1 and shards[-1][1] - shards[-1][0] + 1 < shard_size:
+            shards[-1][1] = page_num
         else:
-            # Add character to current word
-            current_word += char
-            if current_word_data is None:
-                current_word_data = char_data
-    
-    # Don't forget the last word
-    if current_word and current_word_data:
-        words.append({
-            'text': current_word,
-            'size': current_word_data['size'],
-            'fontname': current_word_data['fontname'],
-            'x0': current_word_data['x0'],
-            'y0': current_word_data['y0']
-        })
+            shards.append([page_num, page_num])
+    log.debug("  Splitting %d of %d pages into %d shard(s)", len(missing), total_pages, len(shards))
     
-    return words
+    pool = ProcessPoolExecutor(max_workers=min(page_workers, len(shards)), initializer=configure_logging,
+                               initargs=(logging.getLevelName(log.getEffectiveLevel()),))
+    merged = False
+    try:
+        futures = [pool.submit(extract_page_range, pdf_path, first, last, low_memory, io_mode, read_ahead)
+                   for first, last in shards]
+        # Merge back in page order, parsed pages in between; shards complete
+        # independently
+        next_page = 1
+        for (first, last), future in zip(shards, futures):
+            for page_num in range(next_page, first):
+                yield page_num, parsed.pop(page_num)
+            pages, page_timings, io_counts = future.result()
+            metrics.merge_pages(page_timings)
+            metrics.add_io(*io_counts)
+            yield from pages
+            next_page = last + 1
+        for page_num in range(next_page, total_pages + 1):
+            yield page_num, parsed.pop(page_num)
+        merged = True
+    finally:
+        # Don't block on outstanding shards if the document is abandoned
+        # (timeout or error part-way through the merge)
+        pool.shutdown(wait=merged, cancel_futures=True)
 
-def is_heading(text, size, fontname, indent):
-    """Returns (True, level) if heading, else (False, None)"""
-    # Clean text for analysis
-    clean_text_val = text.strip()
-    if not clean_text_val or len(clean_text_val) < 2:
-        return False, None
+def _bookmark_level(depth):
+    return ("H1", "H2", "H3")[min(depth, 2)]
+
+def extract_bookmarks(pdf_path, metrics=None, io_mode=DEFAULT_IO_MODE, read_ahead=DEFAULT_READ_AHEAD):
+    """Return the PDF's embedded outline (bookmarks) as a list of
+    {"level", "text", "page"} headings, without parsing any page content.
+
+    Top-level bookmarks map to H1, their children to H2 and anything deeper
+    to H3. Destinations given by name are resolved through the document's
+    named destinations; a bookmark with no resolvable page inherits the page
+    of the bookmark before it. Returns [] if the document has no outline or
+    PyPDF2 is not installed. The file is read through a PdfFile, since
+    PyPDF2 reads all of it into memory when given a path.
+    """
+    if PdfReader is None:
+        return []
     
-    # H1: Large, bold/caps, left/centered
-    if size > 14 and (is_bold(fontname) or clean_text_val.isupper()) and indent < 100:
-        return True, "H1"
-    # H2: medium-large, bold or pattern, not indented
-    elif 12 < size <= 14 and (is_bold(fontname) or any(p.match(clean_text_val) for p in HEADING_PATTERNS)):
-        return True, "H2"
-    # H3: normal heading styles, maybe indented, shorter
-    elif 10 < size <= 12 and (is_bold(fontname) or indent < 80 or any(p.match(clean_text_val) for p in HEADING_PATTERNS)):
-        return True, "H3"
-    return False, None
-
-def extract_headings_from_pdf(pdf_path):
+    with PdfFile(pdf_path, io_mode, read_ahead, metrics) as source:
+        return _read_bookmarks(PdfReader(source))
+
+def _page_tree_offset(ref, offsets):
+    """0-based index of the first page under a PyPDF2 page-tree node.
+
+    Walks up through /Parent, so only the node, its ancestors and, in
+    unbalanced trees, their preceding siblings are read. PyPDF2's own
+    get_destination_page_number reads every page object in the file.
+    `offsets` memoizes {object number: index}.
+    """
+    if ref.idnum not in offsets:
+        parent_ref = ref.get_object().get("/Parent")
+        if parent_ref is None:
+            offsets[ref.idnum] = 0
+        else:
+            parent = parent_ref.get_object()
+            kids = parent["/Kids"]
+            position = [getattr(kid, "idnum", None) for kid in kids].index(ref.idnum)
+            if parent.get("/Count") == len(kids):
+                before = position
+            else:
+                before = sum(kid.get_object().get("/Count", 1) if kid.get_object().get("/Type") == "/Pages" else 1
+                             for kid in kids[:position])
+            offsets[ref.idnum] = _page_tree_offset(parent_ref, offsets) + before
+    return offsets[ref.idnum]
+
+def _destination_page_index(reader, destination, offsets):
+    """0-based page index of a bookmark's destination, or -1"""
+    page = destination.page
+    if isinstance(page, int):
+        return page
+    if not isinstance(page, IndirectObject):
+        return -1
+    try:
+        return _page_tree_offset(page, offsets)
+    except Exception:
+        return reader.get_destination_page_number(destination)
+
+def _read_bookmarks(reader):
     results = []
     seen_titles = set()
-    font_sizes = defaultdict(int)
-    all_texts = []
+    last_page = 1
+    offsets = {}
     
-    print(f"Processing: {os.path.basename(pdf_path)}")
-    
-    with pdfplumber.open(pdf_path) as pdf:
-        total_pages = len(pdf.pages)
-        print(f"  Total pages: {total_pages}")
-        
-        for page_num, page in enumerate(pdf.pages, start=1):
-            print(f"  Processing page {page_num}...")
+    def walk(items, depth):
+        nonlocal last_page
+        for item in items:
+            # A nested list holds the children of the bookmark before it
+            if isinstance(item, list):
+                walk(item, depth + 1)
+                continue
             
-            # Try to extract words first
-            words = page.extract_words(extra_attrs=["size", "fontname", "x0", "y0"])
+            text = _WHITESPACE_RE.sub(' ', item.title or '').strip()
+            try:
+                page_index = _destination_page_index(reader, item, offsets)
+            except Exception:
+                page_index = -1
+            if page_index >= 0:
+                last_page = page_index + 1
             
-            # If words are too short (individual characters), try character extraction
-            if words and any(len(word['text']) == 1 for word in words[:10]):
-                print(f"    Detected character-by-character extraction, reconstructing words...")
-                
-                # Extract characters and reconstruct words
-                chars = page.extract_words(extra_attrs=["size", "fontname", "x0", "y0"], 
-                                         keep_blank_chars=True, 
-                                         x_tolerance=3, 
-                                         y_tolerance=3)
-                
-                # Group characters by line (y position) and reconstruct words
-                lines = defaultdict(list)
-                for char in chars:
-                    if char['text'].strip():  # Skip empty characters
-                        y_pos = round(char['y0'], 1)  # Round to group nearby lines
-                        lines[y_pos].append(char)
-                
-                # Process each line
-                for y_pos in sorted(lines.keys()):
-                    line_chars = lines[y_pos]
-                    # Sort characters by x position
-                    line_chars.sort(key=lambda x: x['x0'])
-                    
-                    # Reconstruct words from this line
-                    line_words = reconstruct_words_from_characters(line_chars)
-                    
-                    for word in line_words:
-                        text = word['text'].strip()
-                        if not text or len(text) > 90:
-                            continue
-                        
-                        size = word['size']
-                        font = word['fontname']
-                        indent = word['x0']
-                        
-                        # Collect statistics
-                        font_sizes[size] += 1
-                        all_texts.append((text, size, font, indent))
-                        
-                        ishead, level = is_heading(text, size, font, indent)
-                        if ishead:
-                            # Clean the text properly
-                            cleaned_text = clean_text(text)
-                            if cleaned_text:
-                                entry = {
-                                    "level": level,
-                                    "text": cleaned_text,
-                                    "page": page_num
-                                }
-                                key = (cleaned_text.lower(), level)
-                                if key not in seen_titles:
-                                    results.append(entry)
-                                    seen_titles.add(key)
-                                    print(f"    Found heading: {cleaned_text} (Level: {level}, Size: {size}, Font: {font})")
-            else:
-                # Normal word extraction
-                for word in words:
-                    text = word['text'].strip()
-                    if not text or len(text) > 90:
+            level = _bookmark_level(depth)
+            key = (text.lower(), level)
+            if text and key not in seen_titles:
+                seen_titles.add(key)
+                results.append({"level": level, "text": text, "page": last_page})
+    
+    walk(reader.outline, 0)
+    return results
+
+def _page_fingerprint(page):
+    """Hash of a page's raw content streams and XObject (image) data; nothing
+    is decoded or rendered"""
+    digest = hashlib.sha256()
+    page_obj = page.page_obj
+    for stream in page_obj.contents or []:
+        digest.update(resolve1(stream).get_rawdata() or b"")
+    xobjects = resolve1((page_obj.resources or {}).get("XObject")) or {}
+    for name in sorted(xobjects, key=str):
+        xobject = resolve1(xobjects[name])
+        if isinstance(xobject, PDFStream):
+            digest.update(xobject.get_rawdata() or b"")
+    return digest.hexdigest()
+
+def _init_ocr_worker(memory_mb, log_level):
+    """OCR pool initializer: cap the worker's address space (inherited by the
+    tesseract process it starts) so one huge page cannot exhaust memory"""
+    configure_logging(log_level)
+    if memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def ocr_page(pdf_path, page_num, dpi=DEFAULT_OCR_DPI, timeout=DEFAULT_OCR_TIMEOUT, lang=DEFAULT_OCR_LANG):
+    """OCR worker: rasterize one page and return (words, seconds, error), where
+    words are (text, size, fontname, x0, x1, top, bottom) tuples in PDF points.
+
+    Every word on a tesseract line gets the line's tallest box height as its
+    estimated font size, so a line is not split by per-word variation. Errors
+    (including the time limit and MemoryError) are returned as a string, like
+    process_pdf, since not every pytesseract exception survives pickling.
+    """
+    start = time.perf_counter()
+    use_alarm = bool(timeout) and hasattr(signal, "SIGALRM")
+    if use_alarm:
+        previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        with pdfplumber.open(pdf_path) as pdf:
+            page = pdf.pages[page_num - 1]
+            origin_x, origin_y = page.bbox[0], page.bbox[1]
+            image = page.to_image(resolution=dpi).original
+        data = pytesseract.image_to_data(image, lang=lang, output_type=pytesseract.Output.DICT,
+                                         timeout=timeout or 0)
+    except DocumentTimeout:
+        return [], time.perf_counter() - start, f"timed out after {timeout}s"
+    except Exception as e:
+        return [], time.perf_counter() - start, f"{type(e).__name__}: {e}"
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+    
+    scale = 72 / dpi
+    lines = defaultdict(list)
+    for i, text in enumerate(data["text"]):
+        text = text.strip()
+        if text and float(data["conf"][i]) >= OCR_MIN_CONFIDENCE:
+            line_key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            lines[line_key].append(i)
+    words = []
+    for indices in lines.values():
+        size = round(max(data["height"][i] for i in indices) * scale, 2)
+        for i in indices:
+            x0 = origin_x + data["left"][i] * scale
+            top = origin_y + data["top"][i] * scale
+            words.append((data["text"][i].strip(), size, OCR_FONT_NAME, x0, x0 + data["width"][i] * scale,
+                          top, top + data["height"][i] * scale))
+    return words, time.perf_counter() - start, None
+
+def ocr_pages(pdf_path, page_nums, metrics=None, dpi=DEFAULT_OCR_DPI, workers=DEFAULT_OCR_WORKERS,
+              timeout=DEFAULT_OCR_TIMEOUT, memory_mb=DEFAULT_OCR_MEMORY_MB, lang=DEFAULT_OCR_LANG, cache_dir=None,
+              io_mode=DEFAULT_IO_MODE, read_ahead=DEFAULT_READ_AHEAD):
+    """OCR the given text-less pages in a separate pool of `workers` processes.
+
+    Pages without images (blank pages) are skipped. If cache_dir is given,
+    results are cached there by page fingerprint (raw content and image
+    data), DPI and language, so re-runs and identical pages in other
+    documents are not OCRed again. A page that fails, times out or runs out
+    of memory is logged and left empty. Returns {page_num: [Word]}.
+    """
+    if metrics is None:
+        metrics = DocumentMetrics(os.path.basename(pdf_path))
+    if pytesseract is None:
+        log.warning("%s: pytesseract is not installed, %d page(s) without text were not OCRed",
+                    os.path.basename(pdf_path), len(page_nums))
+        return {}
+    
+    cache = OutlineCache(cache_dir) if cache_dir else None
+    results = {}
+    pending = {}  # page_num -> cache key
+    with open_pdf(pdf_path, metrics, io_mode, read_ahead) as pdf:
+        for page_num in page_nums:
+            page = page_at(pdf, page_num)
+            if not page.images:
+                continue
+            key = None
+            if cache is not None:
+                key = hashlib.sha256(json.dumps([_page_fingerprint(page), dpi, lang, OCR_MIN_CONFIDENCE])
+                                     .encode("utf-8")).hexdigest()
+                words = cache.get(key)
+                if words is not None:
+                    results[page_num] = words
+                    continue
+            pending[page_num] = key
+    metrics.info["ocr_cached_pages"] = len(results)
+    
+    if pending:
+        log.info("  OCR of %d page(s) at %d dpi", len(pending), dpi)
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending)), initializer=_init_ocr_worker,
+                                 initargs=(memory_mb, logging.getLevelName(log.getEffectiveLevel()))) as pool:
+            futures = {pool.submit(ocr_page, pdf_path, page_num, dpi, timeout, lang): page_num
+                       for page_num in pending}
+            for future in as_completed(futures):
+                page_num = futures[future]
+                try:
+                    words, seconds, error = future.result()
+                except BrokenProcessPool:
+                    words, seconds, error = [], 0.0, "OCR process crashed"
+                metrics.add("ocr", seconds, page_num)
+                if error:
+                    log.warning("%s: OCR of page %d failed (%s)", os.path.basename(pdf_path), page_num, error)
+                    continue
+                results[page_num] = words
+                if cache is not None:
+                    cache.put(pending[page_num], words)
+    
+    metrics.info["ocr_pages"] = len(results)
+    return {page_num: [Word(*word) for word in words] for page_num, words in results.items()}
+
+def _normalize_title(text):
+    # Spacing is dropped too: glued words ("ProjectPipeline") still match
+    return "".join(re.findall(r"\w+", text.lower()))
+
+def _toc_entries(lines):
+    """(title, printed_page, x0) for the lines of a page that look like TOC
+    entries, and the number of dotted leaders on the page.
+
+    A right-aligned page number past a wide gap is a line of its own, so a
+    line is joined with the lines to its right in the same row (their middle
+    within its height) until they make an entry."""
+    entries = []
+    leaders = sum(len(TOC_LEADER_PATTERN.findall(line[0])) for line in lines)
+    used = set()
+    for i, (text, size, font, x0, top, bottom) in enumerate(lines):
+        if i in used:
+            continue
+        row = sorted((other[3], j) for j, other in enumerate(lines)
+                     if j not in used and other[3] > x0 and top <= (other[4] + other[5]) / 2 <= bottom)
+        joined = []
+        for _, j in [(x0, i)] + row:
+            joined.append(j)
+            match = TOC_LINE_PATTERN.match(" ".join(lines[k][0] for k in joined))
+            if match:
+                if any(c.isalpha() for c in match.group("title")):
+                    entries.append((match.group("title"), int(match.group("page")), x0))
+                used.update(joined)
+                break
+    return entries, leaders
+
+def _toc_levels(entries):
+    """H1/H2/H3 for each TOC entry: from the numbering depth ("2.1.3") when
+    the entry is numbered, otherwise from its indentation rank"""
+    indents = []
+    for x0 in sorted(x0 for _, _, x0 in entries):
+        if not indents or x0 - indents[-1] > TOC_INDENT_TOLERANCE:
+            indents.append(x0)
+    levels = []
+    for title, _, x0 in entries:
+        match = NUMBERED_PATTERN.match(title)
+        if match:
+            depth = len(re.findall(r"[0-9]+", match.group()))
+        else:
+            depth = 1 + max(i for i, indent in enumerate(indents) if x0 >= indent - TOC_INDENT_TOLERANCE)
+        levels.append(("H1", "H2", "H3")[min(depth, 3) - 1])
+    return levels
+
+def _heading_on_page(lines, title):
+    """Whether a normalized TOC title appears on a page as a heading line,
+    possibly wrapped over the next lines of the same column"""
+    for i, line in enumerate(lines):
+        text = _normalize_title(line[0])
+        if not text or not title.startswith(text):
+            continue
+        # Continuation lines share the heading's column and size; lines of
+        # other columns at the same height sit in between
+        joined = [line[0]] + [other[0] for other in lines[i + 1:]
+                              if abs(other[3] - line[3]) <= TOC_INDENT_TOLERANCE and other[1] == line[1]][:2]
+        if _normalize_title(" ".join(joined)).startswith(title):
+            return True
+    return False
+
+def extract_toc_outline(pdf_path, toc_pages, metrics=None, low_memory=False, parsed=None,
+                        io_mode=DEFAULT_IO_MODE, read_ahead=DEFAULT_READ_AHEAD):
+    """Build an outline from a printed table of contents, parsing only the
+    leading pages and the pages the TOC points to.
+
+    Up to `toc_pages` leading pages are scanned for TOC pages; a TOC that
+    continues past them is followed to its end. Each entry is confirmed by
+    finding its title on the referenced page (shifted by the offset between
+    printed and physical page numbers, or one page either side). Returns the
+    confirmed {"level", "text", "page"} headings, or None if there is no TOC
+    or too few of its entries could be confirmed.
+
+    Parsed lines are kept in `parsed` ({page_num: lines}, if given), so a
+    caller falling back to a full parse doesn't parse those pages twice.
+    """
+    if metrics is None:
+        metrics = DocumentMetrics(os.path.basename(pdf_path))
+    with metrics.stage("open"):
+        pdf = open_pdf(pdf_path, metrics, io_mode, read_ahead)
+        total_pages = page_count(pdf)
+    metrics.info["pages"] = total_pages
+    if parsed is None:
+        parsed = {}
+    
+    def page_lines(page_num):
+        if page_num not in parsed:
+            page = page_at(pdf, page_num)
+            parsed[page_num] = extract_page_lines(page, page_num, metrics)
+            if low_memory:
+                _release_page(page)
+        return parsed[page_num]
+    
+    with pdf:
+        entries = []
+        last_toc_page = 0
+        toc_page_count = 0
+        for page_num in range(1, total_pages + 1):
+            if page_num > toc_pages and not (last_toc_page and last_toc_page == page_num - 1):
+                break
+            lines = page_lines(page_num)
+            with metrics.stage("toc", page_num):
+                page_entries, leaders = _toc_entries(lines)
+            if len(page_entries) >= TOC_MIN_ENTRIES:
+                if len(page_entries) * 2 < leaders:
+                    log.debug("  Only %d of %d dotted leaders on page %d parse as TOC entries",
+                              len(page_entries), leaders, page_num)
+                    return None
+                entries.extend(page_entries)
+                last_toc_page = page_num
+                toc_page_count += 1
+            elif last_toc_page:
+                break
+        if not entries:
+            log.debug("  No table of contents in the first %d page(s)", toc_pages)
+            return None
+        log.debug("  Table of contents: %d entries ending on page %d", len(entries), last_toc_page)
+        
+        titles = [_normalize_title(title) for title, _, _ in entries]
+        
+        def confirm(i, offset):
+            """Physical page where entry i's heading is found, or None"""
+            page_num = entries[i][1] + offset
+            for candidate in (page_num, page_num + 1, page_num - 1):
+                if last_toc_page < candidate <= total_pages:
+                    lines = page_lines(candidate)
+                    with metrics.stage("toc", candidate):
+                        if _heading_on_page(lines, titles[i]):
+                            return candidate
+            return None
+        
+        # Page offset: content starts after the TOC; try it on the first entries
+        offset = None
+        for i in range(min(3, len(entries))):
+            first_offset = max(0, last_toc_page + 1 - entries[i][1])
+            for candidate in range(first_offset, first_offset + TOC_MAX_PAGE_OFFSET + 1):
+                page_num = entries[i][1] + candidate
+                if page_num > total_pages:
+                    break
+                lines = page_lines(page_num)
+                with metrics.stage("toc", page_num):
+                    found = _heading_on_page(lines, titles[i])
+                if found:
+                    offset = candidate
+                    break
+            if offset is not None:
+                break
+        if offset is None:
+            log.debug("  Could not locate the TOC entries in the document")
+            return None
+        
+        levels = _toc_levels(entries)
+        results = []
+        for i, (title, _, _) in enumerate(entries):
+            page_num = confirm(i, offset)
+            if page_num is not None:
+                results.append({"level": levels[i], "text": title, "page": page_num})
+    
+    confirmed = len(results) / len(entries)
+    log.debug("  Confirmed %d of %d TOC entries (page offset %d), parsed %d of %d page(s)",
+              len(results), len(entries), offset, len(parsed), total_pages)
+    if confirmed < TOC_MIN_CONFIRMED or len(results) < TOC_MIN_ENTRIES * toc_page_count:
+        return None
+    return results
+
+def extract_headings_from_pdf(pdf_path, page_workers=1, shard_min_pages=DEFAULT_SHARD_MIN_PAGES,
+                              segment_words=False, on_heading=None, low_memory=False,
+                              outline_source="bookmarks", toc_pages=0, ocr=False, ocr_dpi=DEFAULT_OCR_DPI,
+                              ocr_workers=DEFAULT_OCR_WORKERS, ocr_timeout=DEFAULT_OCR_TIMEOUT,
+                              ocr_memory_mb=DEFAULT_OCR_MEMORY_MB, ocr_lang=DEFAULT_OCR_LANG, ocr_cache_dir=None,
+                              heading_rules=None, io_mode=DEFAULT_IO_MODE, read_ahead=DEFAULT_READ_AHEAD,
+                              metrics=None):
+    """Return the list of {"level", "text", "page"} headings found in a PDF.
+
+    outline_source decides how the PDF's embedded bookmarks are used:
+      bookmarks   use the bookmarks when there are any, skipping page parsing
+                  entirely; otherwise fall back to the heuristics (default)
+      heuristics  ignore bookmarks, always analyse the page layout
+      merge       combine bookmarks with the heuristic headings, ordered by
+                  page; bookmarks take precedence over headings with the
+                  same text
+
+    If given, on_heading is called with each heading as soon as it is
+    final. Bookmark and TOC headings come at once. Layout headings come page
+    by page in the second pass, after every page has been read, because the
+    font tiers are document-wide.
+    With low_memory=True, each page's cached layout objects are dropped as
+    soon as it has been read, and the fallback methods work from a bounded
+    FallbackCandidates store instead of every word in the document.
+    With toc_pages > 0 and no bookmarks in use, the first toc_pages pages are
+    searched for a printed table of contents; if one is found and confirmed,
+    the outline is built from it and only the pages it references are
+    parsed (see extract_toc_outline).
+    With ocr=True, pages that yield no words are rasterized and OCRed (see
+    ocr_pages) and their words go through the same line assembly and
+    classification as the rest of the document.
+    heading_rules is the path of a JSON rules profile merged over
+    DEFAULT_HEADING_RULES (see HeadingClassifier).
+    The PDF is read lazily through PdfFile in the given io_mode with
+    read_ahead-byte blocks; the bytes fetched are recorded as io_bytes.
+    If a DocumentMetrics is given, per-stage and per-page timings, the page
+    and heading counts and the peak RSS are recorded in it.
+    """
+    if metrics is None:
+        metrics = DocumentMetrics(os.path.basename(pdf_path))
+    results = []
+    seen_titles = set()
+    font_sizes = defaultdict(int)
+    all_texts = FallbackCandidates() if low_memory else []
+    rules = load_heading_rules(heading_rules)
+    
+    log.info("Processing: %s", os.path.basename(pdf_path))
+    _reset_peak_rss()
+    
+    bookmarks = []
+    if outline_source != "heuristics":
+        try:
+            with metrics.stage("bookmarks"):
+                bookmarks = extract_bookmarks(pdf_path, metrics, io_mode, read_ahead)
+        except Exception as e:
+            log.warning("%s: could not read bookmarks (%s: %s), using heuristics",
+                        os.path.basename(pdf_path), type(e).__name__, e)
+        if bookmarks:
+            log.info("  Found %d bookmark(s)", len(bookmarks))
+            if on_heading:
+                for entry in bookmarks:
+                    on_heading(entry)
+            if outline_source == "bookmarks":
+                return _finish_document(pdf_path, bookmarks, metrics, "bookmarks")
+            # Merging: headings that duplicate a bookmark's text are dropped
+            seen_titles.update((entry["text"].lower(), level)
+                               for entry in bookmarks for level in ("H1", "H2", "H3"))
+    
+    parsed = {}
+    if toc_pages and not bookmarks:
+        toc = extract_toc_outline(pdf_path, toc_pages, metrics, low_memory, parsed, io_mode, read_ahead)
+        if toc:
+            for entry in toc:
+                with metrics.stage("clean", entry["page"]):
+                    entry["text"] = clean_text(entry["text"], segment_words)
+                key = (entry["text"].lower(), entry["level"])
+                if entry["text"] and key not in seen_titles:
+                    seen_titles.add(key)
+                    results.append(entry)
+                    if on_heading:
+                        on_heading(entry)
+            return _finish_document(pdf_path, results, metrics, "toc")
+        log.info("  No usable table of contents, parsing all pages")
+    
+    # Pass 1: assemble lines and collect document-wide font statistics.
+    # Pages without a text layer are OCRed first, so their lines count too.
+    # In low-memory mode, pass 2 only gets the lines that could be headings:
+    # no sentences or over-long lines, and no plain-font lines in what is the
+    # body size so far. A page whose dropped size turns out to be a heading
+    # size (the body size estimate changed) is read again.
+    classifier = HeadingClassifier(None, rules)
+    size_chars = defaultdict(int)
+    body_chars = defaultdict(int)  # low-memory mode: characters per rounded size
+    dropped = defaultdict(set)  # low-memory mode: {page_num: sizes of dropped body-size lines}
+    
+    def collect(page_num, lines, drop_body=True):
+        for text, size, font, indent, top, bottom in lines:
+            font_sizes[size] += 1
+            size_chars[size] += len(text)
+            all_texts.append((text, size, font, indent, page_num))
+        if not low_memory:
+            return lines
+        for line in lines:
+            body_chars[round(line[1] / FONT_SIZE_RESOLUTION) * FONT_SIZE_RESOLUTION] += len(line[0])
+        body = max(body_chars, key=body_chars.get) if drop_body and body_chars else None
+        kept = []
+        for line in lines:
+            if not classifier.candidate(line[0], line[2]):
+                continue
+            if (body is not None and round(line[1] / FONT_SIZE_RESOLUTION) * FONT_SIZE_RESOLUTION == body
+                    and not classifier.emphasized(line[2])):
+                dropped[page_num].add(line[1])
+                continue
+            kept.append(line)
+        return kept
+    
+    pages = []
+    empty = []
+    for page_num, lines in _iter_page_lines(pdf_path, page_workers, shard_min_pages, low_memory, metrics,
+                                            parsed, io_mode, read_ahead):
+        if not lines:
+            empty.append(page_num)
+        pages.append((page_num, collect(page_num, lines)))
+    if ocr and empty:
+        ocr_words = ocr_pages(pdf_path, empty, metrics, dpi=ocr_dpi, workers=ocr_workers, timeout=ocr_timeout,
+                              memory_mb=ocr_memory_mb, lang=ocr_lang, cache_dir=ocr_cache_dir,
+                              io_mode=io_mode, read_ahead=read_ahead)
+        for i, (page_num, lines) in enumerate(pages):
+            if page_num in ocr_words:
+                with metrics.stage("lines", page_num):
+                    lines = assemble_lines(ocr_words[page_num])
+                # OCR isn't repeated, so nothing is dropped by size here
+                pages[i] = (page_num, collect(page_num, lines, drop_body=False))
+        if ocr_words and not low_memory:
+            # OCR lines were collected last; put the fallback words back in page order
+            all_texts.sort(key=lambda item: item[4])
+    
+    with metrics.stage("classify"):
+        tiers = compute_font_tiers(list(size_chars), list(size_chars.values()), rules["heading_size_ratio"])
+        classifier.tiers = tiers
+    log.debug("  Font tiers: body %spt, headings %s", tiers.body_size, tiers.heading_sizes)
+    
+    stale = {page_num for page_num, sizes in dropped.items() if any(tiers.level_for(size) for size in sizes)}
+    dropped.clear()
+    if stale:
+        log.debug("  Re-reading %d page(s) whose dropped lines are in a heading size", len(stale))
+        with open_pdf(pdf_path, metrics, io_mode, read_ahead) as pdf:
+            for i, (page_num, lines) in enumerate(pages):
+                if page_num in stale:
+                    page = page_at(pdf, page_num)
+                    lines = extract_page_lines(page, page_num, metrics)
+                    _release_page(page)
+                    pages[i] = (page_num, [line for line in lines if classifier.candidate(line[0], line[2])])
+    
+    # Pass 2: classify whole lines against the document's relative tiers.
+    # Consecutive heading lines of the same level and font that sit directly
+    # below each other are one wrapped heading.
+    for page_num, lines in pages:
+        blocks = []
+        with metrics.stage("classify", page_num):
+            for text, size, font, indent, top, bottom in lines:
+                ishead, level = classifier.classify(text, size, font)
+                if not ishead:
+                    continue
+                if blocks:
+                    previous = blocks[-1]
+                    if (previous["level"] == level and previous["font"] == font
+                            and 0 <= top - previous["bottom"] <= rules["block_line_gap"] * size
+                            and len(previous["text"].split()) + len(text.split()) <= rules["max_words"]):
+                        previous["text"] += " " + text
+                        previous["bottom"] = bottom
                         continue
-                    
-                    size = word['size']
-                    font = word['fontname']
-                    indent = word.get('x0', 0)
-                    
-                    # Collect statistics
-                    font_sizes[size] += 1
-                    all_texts.append((text, size, font, indent))
-                    
-                    ishead, level = is_heading(text, size, font, indent)
-                    if ishead:
-                        # Clean the text properly
-                        cleaned_text = clean_text(text)
-                        if cleaned_text:
-                            entry = {
-                                "level": level,
-                                "text": cleaned_text,
-                                "page": page_num
-                            }
-                            key = (cleaned_text.lower(), level)
-                            if key not in seen_titles:
-                                results.append(entry)
-                                seen_titles.add(key)
-                                print(f"    Found heading: {cleaned_text} (Level: {level}, Size: {size}, Font: {font})")
+                blocks.append({"level": level, "text": text, "font": font, "size": size, "bottom": bottom})
+        
+        for block in blocks:
+            level = block["level"]
+            # Clean the text properly
+            with metrics.stage("clean", page_num):
+                cleaned_text = clean_text(block["text"], segment_words)
+            if cleaned_text:
+                entry = {
+                    "level": level,
+                    "text": cleaned_text,
+                    "page": page_num
+                }
+                key = (cleaned_text.lower(), level)
+                if key not in seen_titles:
+                    results.append(entry)
+                    seen_titles.add(key)
+                    if on_heading:
+                        on_heading(entry)
+                    log.debug("    Found heading: %s (Level: %s, Size: %s, Font: %s)",
+                              cleaned_text, level, block["size"], block["font"])
     
     # If no headings found with strict criteria, try fallback methods
     if not results:
-        print("  No headings found with strict criteria. Trying fallback methods...")
+        log.info("  No headings found with strict criteria. Trying fallback methods...")
+        with metrics.stage("fallback"):
+            results = _fallback_headings(font_sizes, all_texts, seen_titles, segment_words, on_heading)
+    
+    if bookmarks:
+        # Stable sort: on each page, bookmarks come before heuristic headings
+        results = sorted(bookmarks + results, key=lambda entry: entry["page"])
+    
+    return _finish_document(pdf_path, results, metrics, outline_source if bookmarks else "heuristics")
+
+def _fallback_headings(font_sizes, all_texts, seen_titles, segment_words, on_heading):
+    """Headings for documents where the strict criteria found nothing"""
+    results = []
+    
+    # Method 1: Look for largest fonts
+    if font_sizes:
+        largest_sizes = sorted(font_sizes.keys(), reverse=True)[:3]
+        log.debug("  Largest font sizes found: %s", largest_sizes)
         
-        # Method 1: Look for largest fonts
-        if font_sizes:
-            largest_sizes = sorted(font_sizes.keys(), reverse=True)[:3]
-            print(f"  Largest font sizes found: {largest_sizes}")
+        for text, size, font, indent, page_num in all_texts:
+            if size in largest_sizes and len(text) > 3 and len(text) < 100:
+                # Skip common non-heading text
+                if text.lower() in ['page', 'of', 'the', 'and', 'or', 'in', 'on', 'at', 'to', 'for']:
+                    continue
+                
+                cleaned_text = clean_text(text, segment_words)
+                if cleaned_text:
+                    entry = {
+                        "level": "H1" if size == largest_sizes[0] else "H2" if size == largest_sizes[1] else "H3",
+                        "text": cleaned_text,
+                        "page": page_num
+                    }
+                    key = (cleaned_text.lower(), entry["level"])
+                    if key not in seen_titles:
+                        results.append(entry)
+                        seen_titles.add(key)
+                        if on_heading:
+                            on_heading(entry)
+                        log.debug("  Fallback heading: %s (Level: %s, Size: %s)", cleaned_text, entry["level"], size)
+    
+    # Method 2: Look for numbered patterns
+    if not results:
+        for text, size, font, indent, page_num in all_texts:
+            if NUMBERED_PATTERN.match(text) and len(text) < 100:
+                cleaned_text = clean_text(text, segment_words)
+                if cleaned_text:
+                    entry = {
+                        "level": "H2",
+                        "text": cleaned_text,
+                        "page": page_num
+                    }
+                    key = (cleaned_text.lower(), entry["level"])
+                    if key not in seen_titles:
+                        results.append(entry)
+                        seen_titles.add(key)
+                        if on_heading:
+                            on_heading(entry)
+                        log.debug("  Numbered heading: %s", cleaned_text)
+    
+    return results
+
+def _finish_document(pdf_path, results, metrics, source):
+    """Record the document-level metrics and log a one-line summary"""
+    metrics.info.update(headings=len(results), source=source, peak_rss_mb=round(peak_rss_mb(), 1))
+    metrics.info.setdefault("pages", None)
+    metrics.info.setdefault("io_bytes", 0)
+    log.info("%s: %d heading(s) from %s in %.2fs, read %d of %d bytes, peak RSS %.1f MB",
+             os.path.basename(pdf_path), len(results), source, metrics.elapsed(), metrics.info["io_bytes"],
+             metrics.info.get("file_bytes", 0), metrics.info["peak_rss_mb"])
+    return results
+
+def build_outline(headings):
+    """Build the {"title", "outline"} structure written for each PDF"""
+    # Determine the main title (first H1 or largest heading)
+    main_title = "Document Outline"
+    if headings:
+        # Look for first H1
+        h1_headings = [h for h in headings if h["level"] == "H1"]
+        if h1_headings:
+            main_title = h1_headings[0]["text"]
+        else:
+            # Use the first heading as title
+            main_title = headings[0]["text"]
+    
+    # Create the required JSON structure
+    return {
+        "title": main_title,
+        "outline": headings
+    }
+
+def write_outline(output_path, output_data):
+    """Write an outline JSON file atomically (temp file + rename)"""
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding='utf-8') as f:
+        json.dump(output_data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, output_path)
+
+class JsonLinesWriter:
+    """Stream NDJSON records to `path`.
+
+    Records are written to `path + ".part"` and flushed one complete line at a
+    time, so a consumer can tail the file while it grows; close() renames it
+    into place. A crash therefore never leaves a truncated file under the final
+    name.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.part_path = path + ".part"
+        self._file = open(self.part_path, "w", encoding="utf-8")
+
+    def write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+        os.replace(self.part_path, self.path)
+
+    def abort(self):
+        """Discard a partially written file"""
+        self._file.close()
+        os.remove(self.part_path)
+
+def heading_record(document, entry):
+    """NDJSON record for a single heading in the per-heading output format"""
+    return {"document": document, **entry}
+
+def document_record(document, output_data):
+    """NDJSON record for a whole document in the combined output format"""
+    return {"document": document, **output_data}
+
+@lru_cache(maxsize=None)
+def _heuristics_fingerprint():
+    """Hash of the data files that shape the output (word fixes, word lists)"""
+    digest = hashlib.sha256()
+    for path in (WORD_FIXES_PATH, WORD_FREQ_PATH, GENERAL_WORD_FREQ_PATH):
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+class OutlineCache:
+    """Persistent on-disk cache of extracted outlines.
+
+    Entries are keyed on the SHA-256 of the PDF bytes plus EXTRACTOR_VERSION,
+    the heuristics data files and any extraction options that change the
+    output, so a hit can be served without opening the PDF at all. The cache
+    is bounded to `max_bytes`; the least recently used entries (by file
+    mtime, refreshed on every hit) are evicted first.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_CACHE_BYTES, rebuild=False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.rebuild = rebuild
+        self.hits = 0
+        self.misses = 0
+        self._total_bytes = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key_for(self, pdf_path, extract_options=None):
+        digest = hashlib.sha256()
+        with open(pdf_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        options = {k: v for k, v in (extract_options or {}).items() if k not in NON_OUTPUT_OPTIONS}
+        if options.get("heading_rules"):
+            # Key on the profile's contents, not its path
+            with open(options["heading_rules"], "rb") as f:
+                options["heading_rules"] = hashlib.sha256(f.read()).hexdigest()
+        digest.update(json.dumps([EXTRACTOR_VERSION, _heuristics_fingerprint(), options],
+                                 sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def get(self, key):
+        """Return the cached {"title", "outline"} for key, or None"""
+        if self.rebuild:
+            self.misses += 1
+            return None
+        path = self._entry_path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            os.utime(path)  # mark as recently used
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, key, data):
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+        
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _, size, _ in self._entries())
+        else:
+            self._total_bytes += os.path.getsize(path) - old_size
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+
+    def _entries(self):
+        """Yield (path, size, mtime) for every cache entry"""
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".json"):
+                    st = entry.stat()
+                    yield entry.path, st.st_size, st.st_mtime
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        # Evict down to 90% of the limit so we don't rescan on every put
+        target = self.max_bytes * 0.9
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        self._total_bytes = total
+
+class DocumentTimeout(Exception):
+    """Raised inside a worker when a document exceeds its time budget"""
+
+def _raise_timeout(signum, frame):
+    raise DocumentTimeout()
+
+def process_pdf(input_path, timeout=None, stream_path=None, profile_path=None, **extract_options):
+    """Extract a single PDF in isolation.
+
+    Returns (output_data, error, metrics), where metrics is the document's
+    DocumentMetrics.as_dict(). Any exception raised while parsing, or the
+    document running past `timeout` seconds, is reported as an error string
+    instead of propagating, so one bad file cannot stop a batch.
+
+    If stream_path is given, each heading is also written to it as an NDJSON
+    record when it is classified, after the document has been read (font
+    tiers are document-wide). If profile_path is given, the extraction
+    runs under cProfile and the stats are dumped there (also when the
+    document fails or times out).
+    """
+    document = os.path.basename(input_path)
+    metrics = DocumentMetrics(document)
+    profiler = cProfile.Profile() if profile_path else None
+    use_alarm = bool(timeout) and hasattr(signal, "SIGALRM")
+    if use_alarm:
+        previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    writer = None
+    try:
+        if stream_path:
+            writer = JsonLinesWriter(stream_path)
+            extract_options["on_heading"] = lambda entry: writer.write(heading_record(document, entry))
+        if profiler:
+            profiler.enable()
+        headings = extract_headings_from_pdf(input_path, metrics=metrics, **extract_options)
+        if profiler:
+            profiler.disable()
+        if writer:
+            with metrics.stage("write"):
+                writer.close()
+        return build_outline(headings), None, metrics.as_dict()
+    except DocumentTimeout:
+        if writer:
+            writer.abort()
+        return None, f"timed out after {timeout}s", metrics.as_dict()
+    except Exception as e:
+        if writer:
+            writer.abort()
+        return None, f"{type(e).__name__}: {e}", metrics.as_dict()
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+            log.info("  Profile written to: %s", profile_path)
+
+def _output_path(output_dir, filename, output_format):
+    """Per-document output file of the json and jsonl formats"""
+    return os.path.join(output_dir, filename.replace('.pdf', '.jsonl' if output_format == "jsonl" else '.json'))
+
+def _stream_path(output_dir, filename, output_format):
+    """Per-document NDJSON file a worker streams headings into, if any"""
+    if output_format != "jsonl":
+        return None
+    return _output_path(output_dir, filename, output_format)
+
+def _profile_path(profile_dir, filename, profile_docs):
+    """cProfile output file for a document matching one of the profile_docs globs, if any"""
+    if not profile_dir or not any(fnmatch.fnmatch(filename, pattern) for pattern in profile_docs):
+        return None
+    return os.path.join(profile_dir, filename.replace('.pdf', '.prof'))
+
+def configure_logging(level=DEFAULT_LOG_LEVEL):
+    """Send the extractor's log records to stderr at `level`. Also used as the
+    worker-process initializer, so spawned workers log like the parent."""
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(processName)s %(message)s")
+    log.setLevel(level)
+
+def _run_pool(filenames, input_dir, workers, timeout, extract_options, stream_paths, profile_paths):
+    """Yield (filename, output_data, error, metrics) as documents finish.
+
+    If a worker process dies outright (e.g. a segfault in a native library),
+    the pool is rebuilt and the documents that were still in flight are
+    retried, up to MAX_DOCUMENT_ATTEMPTS times each.
+    """
+    attempts = defaultdict(int)
+    pending = list(filenames)
+    log_level = logging.getLevelName(log.getEffectiveLevel())
+    while pending:
+        retry = []
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending)), initializer=configure_logging,
+                                 initargs=(log_level,)) as pool:
+            futures = {}
+            for filename in pending:
+                attempts[filename] += 1
+                input_path = os.path.join(input_dir, filename)
+                future = pool.submit(process_pdf, input_path, timeout, stream_paths[filename],
+                                     profile_paths[filename], **extract_options)
+                futures[future] = filename
             
-            for text, size, font, indent in all_texts:
-                if size in largest_sizes and len(text) > 3 and len(text) < 100:
-                    # Skip common non-heading text
-                    if text.lower() in ['page', 'of', 'the', 'and', 'or', 'in', 'on', 'at', 'to', 'for']:
+            for future in as_completed(futures):
+                filename = futures[future]
+                try:
+                    output_data, error, metrics = future.result()
+                except BrokenProcessPool:
+                    if attempts[filename] < MAX_DOCUMENT_ATTEMPTS:
+                        retry.append(filename)
                         continue
-                    
-                    cleaned_text = clean_text(text)
-                    if cleaned_text:
-                        entry = {
-                            "level": "H1" if size == largest_sizes[0] else "H2" if size == largest_sizes[1] else "H3",
-                            "text": cleaned_text,
-                            "page": 1
-                        }
-                        key = (cleaned_text.lower(), entry["level"])
-                        if key not in seen_titles:
-                            results.append(entry)
-                            seen_titles.add(key)
-                            print(f"  Fallback heading: {cleaned_text} (Level: {entry['level']}, Size: {size})")
+                    output_data, error, metrics = None, "worker process crashed", None
+                yield filename, output_data, error, metrics
+        pending = retry
+
+class RunMetrics:
+    """Summary of a batch, aggregated in the main process from the
+    DocumentMetrics.as_dict() records that workers return.
+
+    write() saves it as JSON (totals plus per-document and per-page timings)
+    or in the Prometheus text exposition format (totals and per-document
+    gauges), e.g. for node_exporter's textfile collector.
+    """
+
+    def __init__(self):
+        self.documents = []
+        self.status = Counter()
+        self._started = time.perf_counter()
+        self._finished = None
+
+    def add(self, filename, status, metrics=None, write_seconds=0.0):
+        """Record a finished document; status is "ok", "failed" or "cached" """
+        self.status[status] += 1
+        record = dict(metrics) if metrics else {"document": filename, "stages": {}, "page_timings": []}
+        record["document"] = filename
+        record["status"] = status
+        if write_seconds:
+            stages = record["stages"] = dict(record["stages"])
+            write = stages.get("write", {"seconds": 0.0, "calls": 0})
+            stages["write"] = {"seconds": round(write["seconds"] + write_seconds, 6), "calls": write["calls"] + 1}
+        self.documents.append(record)
+
+    def finish(self):
+        self._finished = time.perf_counter()
+
+    def summary(self):
+        seconds = (self._finished or time.perf_counter()) - self._started
+        pages = sum(doc.get("pages") or 0 for doc in self.documents if doc["status"] == "ok")
+        stages = defaultdict(lambda: {"seconds": 0.0, "calls": 0})
+        for doc in self.documents:
+            for name, stage in doc["stages"].items():
+                stages[name]["seconds"] += stage["seconds"]
+                stages[name]["calls"] += stage["calls"]
+        return {
+            "extractor_version": EXTRACTOR_VERSION,
+            "seconds": round(seconds, 6),
+            "documents": dict(self.status),
+            "pages": pages,
+            "pages_per_sec": round(pages / seconds, 3) if seconds else None,
+            "peak_rss_mb": max((doc.get("peak_rss_mb") or 0 for doc in self.documents), default=0),
+            "io_bytes": sum(doc.get("io_bytes") or 0 for doc in self.documents),
+            "stages": {name: {"seconds": round(stage["seconds"], 6), "calls": stage["calls"]}
+                       for name, stage in sorted(stages.items())},
+            "per_document": self.documents,
+        }
+
+    def to_prometheus(self):
+        summary = self.summary()
+        lines = []
         
-        # Method 2: Look for numbered patterns
-        if not results:
-            for text, size, font, indent in all_texts:
-                if re.match(r"^(?:[0-9]+\.?)+\s+", text) and len(text) < 100:
-                    cleaned_text = clean_text(text)
-                    if cleaned_text:
-                        entry = {
-                            "level": "H2",
-                            "text": cleaned_text,
-                            "page": 1
-                        }
-                        key = (cleaned_text.lower(), entry["level"])
-                        if key not in seen_titles:
-                            results.append(entry)
-                            seen_titles.add(key)
-                            print(f"  Numbered heading: {cleaned_text}")
-    
-    print(f"  Total headings found: {len(results)}")
-    return results
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP outline_{name} {help_text}")
+            lines.append(f"# TYPE outline_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{_prometheus_escape(v)}"' for k, v in labels.items())
+                lines.append(f"outline_{name}{{{label_text}}} {value}" if label_text else f"outline_{name} {value}")
+        
+        metric("run_seconds", "gauge", "Wall-clock duration of the batch", [({}, summary["seconds"])])
+        metric("documents_total", "counter", "Documents by outcome",
+               [({"status": status}, count) for status, count in sorted(summary["documents"].items())])
+        metric("pages_total", "counter", "Pages parsed", [({}, summary["pages"])])
+        metric("io_bytes_total", "counter", "Bytes read from input PDFs", [({}, summary["io_bytes"])])
+        metric("stage_seconds_total", "counter", "Time spent per extraction stage, summed over documents",
+               [({"stage": name}, stage["seconds"]) for name, stage in summary["stages"].items()])
+        metric("stage_calls_total", "counter", "Timed calls per extraction stage",
+               [({"stage": name}, stage["calls"]) for name, stage in summary["stages"].items()])
+        extracted = [doc for doc in self.documents if doc["status"] != "cached" and "seconds" in doc]
+        metric("document_seconds", "gauge", "Extraction time per document",
+               [({"document": doc["document"], "status": doc["status"]}, doc["seconds"]) for doc in extracted])
+        metric("document_peak_rss_mb", "gauge", "Peak resident set size per document in MB",
+               [({"document": doc["document"]}, doc["peak_rss_mb"]) for doc in extracted if doc.get("peak_rss_mb")])
+        metric("document_io_bytes", "gauge", "Bytes read from each input PDF",
+               [({"document": doc["document"]}, doc["io_bytes"]) for doc in extracted if "io_bytes" in doc])
+        return "\n".join(lines) + "\n"
+
+    def write(self, path, metrics_format="json"):
+        """Write the run summary atomically in one of METRICS_FORMATS"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            if metrics_format == "prometheus":
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.summary(), f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+def _prometheus_escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def process_all_pdfs(input_dir, output_dir, workers=None, timeout=DEFAULT_DOC_TIMEOUT, cache=None,
+                     output_format="json", profile_dir=None, profile_docs=("*",), filenames=None,
+                     **extract_options):
+    """Extract outlines for every PDF in input_dir into output_dir.
+
+    With more than one worker, documents are spread over a process pool and
+    each outline is written as soon as its document finishes. If an
+    OutlineCache is given, unchanged documents are served from it without
+    being parsed. Extra keyword arguments are passed through to
+    extract_headings_from_pdf.
+
+    output_format is one of OUTPUT_FORMATS:
+      json      one indented <name>.json per PDF (the default)
+      jsonl     one <name>.jsonl per PDF, one record per heading, streamed
+                as headings are classified (after the whole document has been
+                read, since font tiers are document-wide)
+      combined  a single COMBINED_OUTPUT_NAME with one record per document,
+                appended as each document finishes
+
+    If profile_dir is given, documents whose file name matches one of the
+    profile_docs globs are extracted under cProfile, with the stats written
+    to <profile_dir>/<name>.prof.
+
+    filenames limits the batch to those PDFs in input_dir (default: all).
 
-def process_all_pdfs(input_dir, output_dir):
-    pdf_count = 0
-    for filename in os.listdir(input_dir):
-        if not filename.lower().endswith(".pdf"):
+    Returns the RunMetrics of the batch.
+    """
+    run_metrics = RunMetrics()
+    if filenames is None:
+        filenames = sorted(f for f in os.listdir(input_dir) if f.lower().endswith(".pdf"))
+    if not filenames:
+        log.warning("No PDF files found in input directory!")
+        run_metrics.finish()
+        return run_metrics
+    
+    cache_keys = {}
+    cached = []
+    to_extract = filenames
+    if cache is not None:
+        to_extract = []
+        for filename in filenames:
+            try:
+                key = cache.key_for(os.path.join(input_dir, filename), extract_options)
+                output_data = cache.get(key)
+            except OSError as e:
+                # Extract it uncached: process_pdf reports the file as failed
+                log.debug("  Cache lookup failed for %s: %s", filename, e)
+                to_extract.append(filename)
+                continue
+            if output_data is not None:
+                cached.append((filename, output_data, None, None))
+            else:
+                cache_keys[filename] = key
+                to_extract.append(filename)
+        log.info("Cache: %d hit(s), %d miss(es)", len(cached), len(to_extract))
+    
+    workers = workers or os.cpu_count() or 1
+    if to_extract:
+        log.info("Processing %d PDF file(s) with %d worker(s)", len(to_extract), workers)
+    
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+    cache_hits = {filename for filename, _, _, _ in cached}
+    stream_paths = {filename: _stream_path(output_dir, filename, output_format) for filename in filenames}
+    profile_paths = {filename: _profile_path(profile_dir, filename, profile_docs) for filename in filenames}
+    if workers == 1 or len(to_extract) <= 1:
+        extracted = (
+            (filename,) + process_pdf(os.path.join(input_dir, filename), timeout, stream_paths[filename],
+                                      profile_paths[filename], **extract_options)
+            for filename in to_extract
+        )
+    else:
+        extracted = _run_pool(to_extract, input_dir, workers, timeout, extract_options, stream_paths,
+                              profile_paths)
+    
+    combined = None
+    if output_format == "combined":
+        combined = JsonLinesWriter(os.path.join(output_dir, COMBINED_OUTPUT_NAME))
+        log.info("  Streaming outlines to: %s", combined.part_path)
+    
+    failed = []
+    for filename, output_data, error, metrics in chain(cached, extracted):
+        if error:
+            failed.append(filename)
+            log.warning("  Failed: %s (%s)", filename, error)
+            run_metrics.add(filename, "failed", metrics)
             continue
         
-        pdf_count += 1
-        input_path = os.path.join(input_dir, filename)
-        headings = extract_headings_from_pdf(input_path)
+        write_start = time.perf_counter()
+        if output_format == "json":
+            output_path = _output_path(output_dir, filename, output_format)
+            write_outline(output_path, output_data)
+            log.debug("  Saved outline to: %s", output_path)
+        elif output_format == "jsonl":
+            output_path = stream_paths[filename]
+            if filename in cache_hits:
+                # Nothing was streamed by a worker, write the cached outline here
+                writer = JsonLinesWriter(output_path)
+                for entry in output_data["outline"]:
+                    writer.write(heading_record(filename, entry))
+                writer.close()
+            log.debug("  Saved outline to: %s", output_path)
+        else:
+            combined.write(document_record(filename, output_data))
         
-        # Determine the main title (first H1 or largest heading)
-        main_title = "Document Outline"
-        if headings:
-            # Look for first H1
-            h1_headings = [h for h in headings if h["level"] == "H1"]
-            if h1_headings:
-                main_title = h1_headings[0]["text"]
-            else:
-                # Use the first heading as title
-                main_title = headings[0]["text"]
+        if filename in cache_keys:
+            cache.put(cache_keys[filename], output_data)
+        run_metrics.add(filename, "cached" if filename in cache_hits else "ok", metrics,
+                        time.perf_counter() - write_start)
+    
+    if combined:
+        combined.close()
+        log.info("  Saved outlines to: %s", combined.path)
+    
+    run_metrics.finish()
+    summary = run_metrics.summary()
+    log.info("Processed %d PDF file(s), %d page(s) in %.2fs", len(filenames) - len(failed), summary["pages"],
+             summary["seconds"])
+    if failed:
+        log.error("Failed to process %d PDF file(s): %s", len(failed), ", ".join(failed))
+    return run_metrics
+
+def _scan_pdfs(input_dir):
+    """{filename: [size, mtime_ns]} for the PDFs in input_dir, from a single
+    scandir pass (no per-file stat calls on most platforms)"""
+    found = {}
+    with os.scandir(input_dir) as entries:
+        for entry in entries:
+            if entry.name.lower().endswith(".pdf") and entry.is_file():
+                st = entry.stat()
+                found[entry.name] = [st.st_size, st.st_mtime_ns]
+    return found
+
+def _load_manifest(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _remove_output(output_dir, filename, output_format):
+    try:
+        os.remove(_output_path(output_dir, filename, output_format))
+    except OSError:
+        pass
+
+def watch_pdfs(input_dir, output_dir, poll_interval=DEFAULT_POLL_INTERVAL, settle=DEFAULT_SETTLE_SECONDS,
+               output_format="json", stop=None, on_batch=None, **process_options):
+    """Keep output_dir in sync with input_dir until `stop` (a threading.Event) is set.
+
+    input_dir is polled every poll_interval seconds. A new or changed PDF is
+    processed once its size and mtime have stayed the same for `settle`
+    seconds, so files still being copied in are not picked up half-written.
+    The fingerprint of every extracted file is kept in MANIFEST_NAME in
+    output_dir, so unchanged files are skipped across restarts too. When a
+    source PDF is deleted, or changes and then fails to extract, its output
+    is removed. Failed files are left out of the manifest and retried after
+    WATCH_RETRY_SECONDS, doubling with each failure up to
+    WATCH_RETRY_MAX_SECONDS, since a failure may be transient (a timeout
+    under load, a crashed worker).
+
+    Documents are processed by process_all_pdfs with process_options. If
+    given, on_batch is called with the RunMetrics of each batch. The
+    combined output format rewrites a single file per batch and is not
+    supported here.
+    """
+    if output_format == "combined":
+        raise ValueError("watch mode needs a per-document output format (json or jsonl)")
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = _load_manifest(manifest_path)
+    pending = {}  # filename -> (fingerprint, when first seen with it)
+    failures = {}  # filename -> (fingerprint, failed attempts, when to retry)
+    log.info("Watching %s (%d file(s) in manifest)", input_dir, len(manifest))
+    
+    while not (stop and stop.is_set()):
+        current = _scan_pdfs(input_dir)
+        now = time.monotonic()
+        changed = False
         
-        # Create the required JSON structure
-        output_data = {
-            "title": main_title,
-            "outline": headings
-        }
+        for filename in [f for f in manifest if f not in current]:
+            _remove_output(output_dir, filename, output_format)
+            del manifest[filename]
+            pending.pop(filename, None)
+            changed = True
+            log.info("Removed output for deleted %s", filename)
+        for filename in [f for f in failures if f not in current]:
+            del failures[filename]
         
-        output_path = os.path.join(output_dir, filename.replace('.pdf', '.json'))
+        ready = []
+        for filename, fingerprint in current.items():
+            if manifest.get(filename, {}).get("fingerprint") == fingerprint:
+                pending.pop(filename, None)
+                continue
+            failure = failures.get(filename)
+            if failure and failure[0] == fingerprint and now < failure[2]:
+                continue
+            seen = pending.get(filename)
+            if seen is None or seen[0] != fingerprint:
+                pending[filename] = (fingerprint, now)
+            elif now - seen[1] >= settle:
+                ready.append(filename)
         
-        with open(output_path, "w", encoding='utf-8') as f:
-            json.dump(output_data, f, indent=2, ensure_ascii=False)
+        if ready:
+            run_metrics = process_all_pdfs(input_dir, output_dir, output_format=output_format,
+                                           filenames=sorted(ready), **process_options)
+            status = {doc["document"]: doc["status"] for doc in run_metrics.documents}
+            after = _scan_pdfs(input_dir)
+            for filename in ready:
+                if after.get(filename) != pending[filename][0]:
+                    continue  # modified or deleted while processing; picked up next poll
+                del pending[filename]
+                if status.get(filename, "failed") == "failed":
+                    _remove_output(output_dir, filename, output_format)
+                    manifest.pop(filename, None)
+                    failure = failures.get(filename)
+                    attempts = failure[1] + 1 if failure and failure[0] == after[filename] else 1
+                    delay = min(WATCH_RETRY_SECONDS * 2 ** (attempts - 1), WATCH_RETRY_MAX_SECONDS)
+                    failures[filename] = (after[filename], attempts, time.monotonic() + delay)
+                    log.warning("Retrying %s in %.0fs (failed %d time(s))", filename, delay, attempts)
+                    continue
+                failures.pop(filename, None)
+                manifest[filename] = {"fingerprint": after[filename], "status": status[filename]}
+            changed = True
+            if on_batch:
+                on_batch(run_metrics)
         
-        print(f"  Saved outline to: {output_path}")
-    
-    if pdf_count == 0:
-        print("No PDF files found in input directory!")
-    else:
-        print(f"Processed {pdf_count} PDF file(s)")
+        if changed:
+            write_outline(manifest_path, manifest)
+        if stop:
+            stop.wait(poll_interval)
+        else:
+            time.sleep(poll_interval)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Extract heading outlines from PDF files")
+    parser.add_argument("--input-dir", default="./input", help="directory containing PDF files")
+    parser.add_argument("--output-dir", default="./output", help="directory for JSON outlines")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of worker processes (default: CPU count)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_DOC_TIMEOUT,
+                        help="per-document timeout in seconds, 0 to disable (default: %(default)s)")
+    parser.add_argument("--page-workers", type=int, default=1,
+                        help="worker processes per document for page-sharded extraction (default: 1)")
+    parser.add_argument("--shard-min-pages", type=int, default=DEFAULT_SHARD_MIN_PAGES,
+                        help="only shard documents with at least this many pages (default: %(default)s)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help="directory for the outline cache (default: %(default)s)")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_BYTES // (1024 * 1024),
+                        help="maximum cache size in MB (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="neither read nor write the outline cache")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="ignore cached outlines and re-extract everything, refreshing the cache")
+    parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default="json",
+                        help="json: one file per PDF; jsonl: one NDJSON file per PDF with a record per "
+                             "heading, streamed once the document has been read; combined: a single %s "
+                             "with a record per document (default: %%(default)s)" % COMBINED_OUTPUT_NAME)
+    parser.add_argument("--outline-source", choices=OUTLINE_SOURCES, default="bookmarks",
+                        help="bookmarks: trust embedded bookmarks when present; heuristics: always "
+                             "analyse page layout; merge: combine both (default: %(default)s)")
+    parser.add_argument("--toc-pages", type=int, default=0,
+                        help="look for a printed table of contents in the first N pages and, if found, build "
+                             "the outline from it, parsing only the pages it references (default: 0, off)")
+    parser.add_argument("--ocr", action="store_true",
+                        help="OCR pages that have no text layer (needs pytesseract and the tesseract binary)")
+    parser.add_argument("--ocr-dpi", type=int, default=DEFAULT_OCR_DPI,
+                        help="resolution pages are rasterized at for OCR (default: %(default)s)")
+    parser.add_argument("--ocr-workers", type=int, default=DEFAULT_OCR_WORKERS,
+                        help="OCR processes per document (default: %(default)s)")
+    parser.add_argument("--ocr-timeout", type=float, default=DEFAULT_OCR_TIMEOUT,
+                        help="per-page OCR time limit in seconds, 0 to disable (default: %(default)s)")
+    parser.add_argument("--ocr-memory-mb", type=int, default=DEFAULT_OCR_MEMORY_MB,
+                        help="address-space cap per OCR process in MB, 0 to disable (default: %(default)s)")
+    parser.add_argument("--ocr-lang", default=DEFAULT_OCR_LANG,
+                        help="tesseract language(s), e.g. eng+deu (default: %(default)s)")
+    parser.add_argument("--heading-rules", metavar="PATH",
+                        help="JSON heading rules profile overriding the default thresholds and patterns")
+    parser.add_argument("--io-mode", choices=IO_MODES, default=DEFAULT_IO_MODE,
+                        help="how PDFs are read: buffered block reads or mmap; either way only the parts "
+                             "being parsed are fetched (default: %(default)s)")
+    parser.add_argument("--read-ahead", type=int, default=DEFAULT_READ_AHEAD // 1024, metavar="KB",
+                        help="size of each block read from a PDF in KB (default: %(default)s)")
+    parser.add_argument("--low-memory", action="store_true",
+                        help="drop each page's parsed objects after use and keep only bounded "
+                             "statistics for the fallback methods")
+    parser.add_argument("--segment-words", action="store_true",
+                        help="split glued words in headings using the bundled word-frequency tables")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and process PDFs as they are added to or changed in the input "
+                             "directory; outputs of deleted PDFs are removed")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="seconds between input directory scans in watch mode (default: %(default)s)")
+    parser.add_argument("--settle", type=float, default=DEFAULT_SETTLE_SECONDS,
+                        help="seconds a PDF's size and mtime must stay unchanged before it is processed "
+                             "in watch mode (default: %(default)s)")
+    parser.add_argument("--log-level", type=str.upper, choices=LOG_LEVELS, default=DEFAULT_LOG_LEVEL,
+                        help="logging verbosity on stderr; INFO gives per-document progress and DEBUG "
+                             "per-page detail (default: %(default)s)")
+    parser.add_argument("--metrics-file",
+                        help="write a run summary with per-stage, per-document and per-page timings here")
+    parser.add_argument("--metrics-format", choices=METRICS_FORMATS, default="json",
+                        help="format of --metrics-file: json, or prometheus text for a textfile "
+                             "collector (default: %(default)s)")
+    parser.add_argument("--profile-docs", action="append", metavar="GLOB",
+                        help="run documents whose file name matches GLOB under cProfile; may be repeated")
+    parser.add_argument("--profile-dir", default=DEFAULT_PROFILE_DIR,
+                        help="directory for the .prof files of --profile-docs (default: %(default)s)")
+    args = parser.parse_args(argv)
+    if args.watch and args.output_format == "combined":
+        parser.error("--watch needs --output-format json or jsonl")
+    if args.heading_rules:
+        try:
+            load_heading_rules(args.heading_rules)
+        except (OSError, ValueError) as e:
+            parser.error(f"--heading-rules: {e}")
+    return args
 
 if __name__ == "__main__":
-    in_dir = "./input"
-    out_dir = "./output"
+    args = parse_args()
+    configure_logging(args.log_level)
+    in_dir = args.input_dir
+    out_dir = args.output_dir
     
-    print(f"Input directory: {in_dir}")
-    print(f"Output directory: {out_dir}")
+    log.info("Input directory: %s", in_dir)
+    log.info("Output directory: %s", out_dir)
     
     if not os.path.exists(in_dir):
-        print(f"Error: Input directory '{in_dir}' does not exist!")
+        log.error("Input directory '%s' does not exist!", in_dir)
         exit(1)
     
     os.makedirs(out_dir, exist_ok=True)
-    process_all_pdfs(in_dir, out_dir)
-    print("Outline extraction complete.")
+    cache = None
+    if not args.no_cache:
+        cache = OutlineCache(args.cache_dir, max_bytes=args.cache_size * 1024 * 1024, rebuild=args.rebuild)
+    process_options = dict(workers=max(1, args.workers), timeout=args.timeout or None, cache=cache,
+                           output_format=args.output_format,
+                           profile_dir=args.profile_docs and args.profile_dir,
+                           profile_docs=args.profile_docs or (),
+                           page_workers=args.page_workers, shard_min_pages=args.shard_min_pages,
+                           segment_words=args.segment_words, low_memory=args.low_memory,
+                           outline_source=args.outline_source, toc_pages=args.toc_pages,
+                           heading_rules=args.heading_rules, io_mode=args.io_mode,
+                           read_ahead=max(4, args.read_ahead) * 1024)
+    if args.ocr:
+        process_options.update(ocr=True, ocr_dpi=args.ocr_dpi, ocr_workers=max(1, args.ocr_workers),
+                               ocr_timeout=args.ocr_timeout or None, ocr_memory_mb=args.ocr_memory_mb,
+                               ocr_lang=args.ocr_lang,
+                               ocr_cache_dir=None if args.no_cache else os.path.join(args.cache_dir, "ocr"))
+    
+    def write_metrics(run_metrics):
+        if args.metrics_file:
+            run_metrics.write(args.metrics_file, args.metrics_format)
+            log.info("Metrics written to: %s", args.metrics_file)
+    
+    if args.watch:
+        # SIGTERM (docker stop) finishes the current batch, then exits
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        try:
+            watch_pdfs(in_dir, out_dir, poll_interval=args.poll_interval, settle=args.settle, stop=stop,
+                       on_batch=write_metrics, **process_options)
+        except KeyboardInterrupt:
+            pass
+    else:
+        write_metrics(process_all_pdfs(in_dir, out_dir, **process_options))
+    log.info("Outline extraction complete.")